@@ -571,6 +571,23 @@ def bulk_appointments(Models, salon, specialist, procedure_cut):
     return appointments
 
 
+@pytest.fixture
+def make_dataset():
+    """
+    Фабрика синтетических данных для нагрузочных тестов
+    Создает салоны, мастеров, процедуры и записи через bulk_create
+    по заданной форме; результат детерминирован при одинаковом seed
+
+    Пример: make_dataset(salons=1, specialists=40, days=28, occupancy=1.0)
+    """
+    from bot.datagen import DatasetShape, generate_dataset
+
+    def factory(**shape):
+        return generate_dataset(DatasetShape(**shape))
+
+    return factory
+
+
 # ============================================================================
 # PYTEST FIXTURES: ПОЛЬЗОВАТЕЛЬСКИЕ ДАННЫЕ ДЛЯ ХЕНДЛЕРОВ
 # ============================================================================
@@ -612,6 +629,127 @@ def clear_user_data():
     USER_DATA.clear()
 
 
+def _optional_attr(module_name, attr):
+    """
+    Возвращает атрибут модуля приложения или None, если модуля/атрибута еще нет.
+    Автоматические фикстуры сброса состояния не должны ронять тесты,
+    не связанные с этим состоянием
+    """
+    import importlib
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        return None
+    return getattr(module, attr, None)
+
+
+# Глобальное состояние приложения, которое сбрасывается вокруг каждого теста:
+# (модуль, атрибут) -> объект с методом clear()
+APP_STATE_TO_CLEAR = [
+    ("funcs", "AVAILABILITY_CACHE"),   # кеш доступности is_free_time и его счетчики
+    ("keyboards", "KEYBOARD_CACHE"),   # готовые клавиатуры и счетчики их построения
+    ("handlers", "PRICE_LIST"),        # закешированный прайс-лист процедур
+    ("holds", "SLOT_HOLDS"),           # временные удержания слотов
+    ("outbound", "OUTBOUND"),          # неотправленные исходящие сообщения и метрики очереди
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_app_state():
+    """
+    Автоматически сбрасывает кеши и хранилища из APP_STATE_TO_CLEAR
+    до и после каждого теста (отсутствующие в приложении пропускаются)
+    """
+    states = [_optional_attr(module, attr) for module, attr in APP_STATE_TO_CLEAR]
+    states = [state for state in states if state is not None]
+    for state in states:
+        state.clear()
+    yield
+    for state in states:
+        state.clear()
+
+
+@pytest.fixture
+def inline_outbound():
+    """
+    Доставляет исходящие сообщения бота сразу, в потоке хендлера,
+    чтобы тесты хендлеров могли проверять bot.sent сразу после вызова.
+    Подключается явно: @pytest.mark.usefixtures("inline_outbound")
+    """
+    outbound = _optional_attr("outbound", "OUTBOUND")
+    if outbound is None:
+        yield
+        return
+    with outbound.inline():
+        yield
+
+
+def _metrics_switched(enabled):
+    """
+    Переключает глобальный METRICS на время теста с чистыми счетчиками,
+    после теста сбрасывает накопленное и возвращает прежнее состояние
+    """
+    from metrics import METRICS
+
+    was_enabled = METRICS.enabled
+    METRICS.reset()
+    if enabled:
+        METRICS.enable()
+    else:
+        METRICS.disable()
+    yield METRICS
+    METRICS.reset()
+    if was_enabled:
+        METRICS.enable()
+    else:
+        METRICS.disable()
+
+
+@pytest.fixture
+def metrics_enabled():
+    """Включает сбор метрик на время теста"""
+    yield from _metrics_switched(True)
+
+
+@pytest.fixture
+def metrics_disabled():
+    """Выключает сбор метрик на время теста"""
+    yield from _metrics_switched(False)
+
+
+# ============================================================================
+# PYTEST FIXTURES: БЮДЖЕТЫ SQL-ЗАПРОСОВ
+# ============================================================================
+
+# Максимальное число SQL-запросов на один вызов горячих путей.
+# Рост числа запросов (N+1) в этих путях должен ронять тесты, а не продакшен.
+QUERY_BUDGETS = {
+    "is_free_time": 1,
+    "is_free_time_many": 1,
+    "get_salon_keyboard": 1,
+    "get_procedure_keyboard": 1,
+    "get_time_slots_keyboard": 1,
+    "get_date_keyboard": 0,
+    # SAVEPOINT + SELECT ... FOR UPDATE + INSERT + RELEASE + справочники для подтверждения
+    "phone_handler": 6,
+}
+
+
+@pytest.fixture
+def query_budget(django_assert_max_num_queries):
+    """
+    Возвращает контекстный менеджер, проверяющий бюджет запросов пути из QUERY_BUDGETS
+
+    Пример:
+        with query_budget("is_free_time"):
+            is_free_time("salon", salon.id, date)
+    """
+    def budget(name):
+        return django_assert_max_num_queries(QUERY_BUDGETS[name])
+
+    return budget
+
+
 # ============================================================================
 # PYTEST FIXTURES: DJANGO ADMIN
 # ============================================================================
@@ -718,3 +856,27 @@ def get_callback_data_list(keyboard):
         for btn in row
         if btn.callback_data
     ]
+
+
+def get_callback_payloads(keyboard, kind):
+    """
+    Декодирует callback_data кнопок клавиатуры через callback_codec
+    и возвращает payload заданного вида; навигационные кнопки пропускаются
+
+    Args:
+        keyboard: InlineKeyboardMarkup
+        kind: вид payload ("salon", "procedure", "time", ...)
+
+    Returns:
+        list: декодированные payload
+    """
+    from callback_codec import decode_callback
+    payloads = []
+    for data in get_callback_data_list(keyboard):
+        try:
+            payload = decode_callback(data)
+        except ValueError:
+            continue
+        if payload.kind == kind:
+            payloads.append(payload)
+    return payloads
@@ -18,3 +18,216 @@ def test_I4_admin_lists_salons(client, admin_user, salon):
     resp = client.get(url)
     assert resp.status_code == 200
     assert salon.name in resp.content.decode("utf-8")
+
+
+# =====================================================
+# ТЕСТ И24: Changelist записей — загрузка связанных объектов
+# =====================================================
+def test_I24_appointment_changelist_queries_do_not_scale(client, admin_user, make_dataset):
+    """
+    Проверка, что число запросов страницы списка записей не зависит
+    от числа строк: салон, мастер и процедура подгружаются JOIN-ом
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from bot.models import Appointment
+
+    client.login(username="admin", password="pass")
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_changelist")
+
+    make_dataset(salons=2, specialists=3, procedures=3, days=1, occupancy=1.0, seed=1)
+    with CaptureQueriesContext(connection) as small:
+        assert client.get(url).status_code == 200
+
+    make_dataset(salons=2, specialists=30, procedures=3, days=5, occupancy=1.0, seed=2)
+    with CaptureQueriesContext(connection) as large:
+        assert client.get(url).status_code == 200
+
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+# =====================================================
+# ТЕСТ И25: Changelist записей — иерархия дат и оценочный счетчик
+# =====================================================
+def test_I25_appointment_admin_estimated_count(client, admin_user, make_dataset, monkeypatch):
+    """
+    Проверка, что admin записей использует date_hierarchy по дате,
+    а после порога пагинатор берет оценку числа строк вместо COUNT(*)
+    """
+    from django.contrib import admin
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from bot.models import Appointment
+    from bot.admin import EstimatedCountPaginator
+
+    model_admin = admin.site._registry[Appointment]
+    assert model_admin.date_hierarchy == "date"
+    assert set(model_admin.list_select_related) >= {"salon", "specialist", "procedure"}
+    assert issubclass(model_admin.paginator, EstimatedCountPaginator)
+    assert model_admin.show_full_result_count is False
+
+    make_dataset(salons=1, specialists=10, procedures=2, days=3, occupancy=1.0, seed=3)
+    monkeypatch.setattr(EstimatedCountPaginator, "estimate_threshold", 100)
+
+    client.login(username="admin", password="pass")
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_changelist")
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    table = Appointment._meta.db_table
+    counts = [q["sql"] for q in ctx.captured_queries
+              if "count(" in q["sql"].lower() and table in q["sql"] and "where" not in q["sql"].lower()]
+    assert counts == [], "Полный COUNT(*) по таблице записей выше порога не выполняется"
+
+
+# =====================================================
+# ТЕСТ И26: Потоковая выгрузка записей в CSV из админки
+# =====================================================
+def test_I26_appointment_csv_export_view_streams(client, admin_user, bulk_appointments):
+    """
+    Проверка, что выгрузка записей за период отдается StreamingHttpResponse:
+    заголовок CSV приходит первым чанком, а строки идут порциями
+    """
+    import csv
+    from django.http import StreamingHttpResponse
+    from bot.models import Appointment
+
+    client.login(username="admin", password="pass")
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_export_csv")
+    response = client.get(url, {"date__gte": "2025-01-10", "date__lte": "2025-01-12"})
+
+    assert response.status_code == 200
+    assert isinstance(response, StreamingHttpResponse)
+    assert response["Content-Type"].startswith("text/csv")
+    assert "attachment" in response["Content-Disposition"]
+
+    chunks = iter(response.streaming_content)
+    header = next(chunks).decode("utf-8")
+    assert header.startswith("id,date,start_time,end_time,salon,specialist,procedure,client_name,client_phone")
+
+    rows = list(csv.reader((header + b"".join(chunks).decode("utf-8")).splitlines()))
+    expected = Appointment.objects.filter(date__range=("2025-01-10", "2025-01-12")).count()
+    assert len(rows) - 1 == expected == 27
+
+
+# =====================================================
+# ТЕСТ И27: Действие админки «Выгрузить в CSV»
+# =====================================================
+def test_I27_appointment_csv_export_action(client, admin_user, bulk_appointments):
+    """
+    Проверка, что действие changelist выгружает только выбранные записи
+    тем же потоковым ответом
+    """
+    from django.http import StreamingHttpResponse
+    from bot.models import Appointment
+
+    client.login(username="admin", password="pass")
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_changelist")
+    selected = [a.pk for a in bulk_appointments[:5]]
+
+    response = client.post(url, {"action": "export_csv", "_selected_action": selected})
+
+    assert isinstance(response, StreamingHttpResponse)
+    lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+    assert len(lines) == 1 + len(selected)
+    assert {int(line.split(",")[0]) for line in lines[1:]} == set(selected)
+
+
+# =====================================================
+# ТЕСТ И28: Массовая отмена записей одним DELETE
+# =====================================================
+@pytest.mark.parametrize("selected_count", [5, 50])
+def test_I28_cancel_appointments_action_is_set_based(client, admin_user, bulk_appointments, selected_count):
+    """
+    Проверка, что отмена выбранных записей выполняется одним DELETE на пачку:
+    число запросов не зависит от числа записей, кеш доступности сбрасывается один раз
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from bot.models import Appointment
+    from funcs import is_free_time, AVAILABILITY_CACHE
+
+    client.login(username="admin", password="pass")
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_changelist")
+    selected = bulk_appointments[:selected_count]
+    first = selected[0]
+    assert is_free_time("master", first.specialist_id, first.date)[first.start_time] is False
+
+    invalidations = AVAILABILITY_CACHE.invalidations
+    with CaptureQueriesContext(connection) as ctx:
+        client.post(url, {"action": "cancel_appointments", "_selected_action": [a.pk for a in selected]})
+
+    deletes = [q for q in ctx.captured_queries if q["sql"].lower().startswith("delete")]
+    assert len(deletes) == 1
+    assert Appointment.objects.count() == len(bulk_appointments) - selected_count
+    assert AVAILABILITY_CACHE.invalidations == invalidations + 1
+    assert is_free_time("master", first.specialist_id, first.date)[first.start_time] is True
+
+
+# =====================================================
+# ТЕСТ И29: Массовый перенос записей к другому мастеру
+# =====================================================
+@pytest.mark.parametrize("selected_count", [5, 50])
+def test_I29_move_appointments_action_detects_conflicts(client, admin_user, Models, salon, specialist,
+                                                        specialist2, procedure_cut, selected_count):
+    """
+    Проверка, что записи заболевшего мастера переносятся к другому одним UPDATE,
+    а записи, пересекающиеся с расписанием нового мастера, остаются на месте.
+    Число SELECT по записям не зависит от размера выборки, кеш доступности сбрасывается один раз
+    """
+    import datetime as dt
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from funcs import is_free_time, AVAILABILITY_CACHE
+    from tests.conftest import create_test_appointment
+
+    Appointment = Models["Appointment"]
+    date = dt.date(2025, 1, 15)
+    # Первая запись пересекается с записью нового мастера, остальные - в свободные дни
+    conflicting = create_test_appointment(Models, salon=salon, specialist=specialist, procedure=procedure_cut,
+                                          date=date, time=dt.time(14, 0), start_time=dt.time(14, 0),
+                                          end_time=dt.time(15, 0), client_phone="+7 900 000-00-00")
+    movable = [
+        create_test_appointment(Models, salon=salon, specialist=specialist, procedure=procedure_cut,
+                                date=date + dt.timedelta(days=i), time=dt.time(10, 0),
+                                start_time=dt.time(10, 0), end_time=dt.time(11, 0),
+                                client_phone=f"+7 900 000-{i // 100:02d}-{i % 100:02d}")
+        for i in range(1, selected_count)
+    ]
+    busy = create_test_appointment(Models, salon=salon, specialist=specialist2, procedure=procedure_cut,
+                                   date=date, time=dt.time(14, 30), start_time=dt.time(14, 30),
+                                   end_time=dt.time(15, 30))
+
+    # Кешируем расписания обоих мастеров, чтобы перенос был обязан их сбросить
+    assert is_free_time("master", specialist.id, date)[dt.time(14, 0)] is False
+    assert is_free_time("master", specialist2.id, date)[dt.time(14, 0)] is False
+
+    client.login(username="admin", password="pass")
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_changelist")
+    invalidations = AVAILABILITY_CACHE.invalidations
+    with CaptureQueriesContext(connection) as ctx:
+        client.post(url, {
+            "action": "move_appointments",
+            "_selected_action": [conflicting.pk] + [a.pk for a in movable],
+            "target_specialist": specialist2.pk,
+            "apply": "1",
+        })
+
+    sql = [q["sql"].lower() for q in ctx.captured_queries]
+    updates = [q for q in sql if q.startswith("update")]
+    selects = [q for q in sql if q.startswith("select") and Appointment._meta.db_table in q]
+    assert len(updates) == 1
+    # Счетчики списка в админке + выбранные записи + одна проверка конфликтов на всю пачку
+    assert len(selects) <= 4, selects
+    assert AVAILABILITY_CACHE.invalidations == invalidations + 1
+
+    assert set(Appointment.objects.filter(specialist=specialist2).values_list("pk", flat=True)) == \
+        {a.pk for a in movable} | {busy.pk}
+    assert Appointment.objects.get(pk=conflicting.pk).specialist_id == specialist.pk
+    assert is_free_time("master", specialist.id, date)[dt.time(14, 0)] is False
+    assert is_free_time("master", specialist2.id, date + dt.timedelta(days=1))[dt.time(10, 0)] is False
+
+    response = client.get(url)
+    messages = [str(m) for m in response.context["messages"]]
+    assert f"Перенесено: {selected_count - 1}, конфликтов: 1" in messages, messages
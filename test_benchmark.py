@@ -0,0 +1,199 @@
+"""
+Статистические микробенчмарки горячих путей записи
+Каждый замер: прогревочные прогоны, серия повторов, перцентили p50/p95/p99
+и число SQL-запросов на вызов. Результаты сохраняются в JSON и сравниваются
+с сохраненным базовым прогоном:
+
+    BENCH_RESULTS=bench_results.json BENCH_BASELINE=bench_baseline.json pytest test_benchmark.py
+"""
+
+import os
+import json
+import time
+import datetime as dt
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+WARMUP = int(os.environ.get("BENCH_WARMUP", 5))
+REPEAT = int(os.environ.get("BENCH_REPEAT", 50))
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", 0.25))  # допустимый рост p95 относительно базы
+
+RESULTS = {}
+
+
+# ============================================================================
+# ИНСТРУМЕНТЫ ЗАМЕРА
+# ============================================================================
+
+def percentile(samples, q):
+    """
+    Перцентиль q (0..100) по отсортированной выборке с линейной интерполяцией
+    """
+    ordered = sorted(samples)
+    pos = (len(ordered) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def run_benchmark(name, func, setup=None, warmup=WARMUP, repeat=REPEAT):
+    """
+    Замеряет func: warmup прогонов без учета, затем repeat замеров.
+    setup вызывается перед каждым прогоном вне замера (например, сброс кешей)
+
+    Returns:
+        dict: p50/p95/p99/mean в миллисекундах и число запросов на вызов
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(ctx.captured_queries))
+
+    result = {
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": sum(samples) / len(samples),
+        "queries": queries,
+        "repeat": repeat,
+    }
+    RESULTS[name] = result
+    print(f"\n[BENCH] {name}: p50={result['p50_ms']:.3f} мс, p95={result['p95_ms']:.3f} мс, "
+          f"p99={result['p99_ms']:.3f} мс, запросов={queries}")
+    return result
+
+
+def load_baseline():
+    """
+    Загружает базовые результаты из BENCH_BASELINE, если файл задан и существует
+    """
+    path = os.environ.get("BENCH_BASELINE")
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def assert_no_regression(name, result):
+    """
+    Сравнивает замер с базой: рост p95 выше TOLERANCE или
+    увеличение числа запросов считается регрессией
+    """
+    base = load_baseline().get(name)
+    if base is None:
+        return
+    assert result["queries"] <= base["queries"], \
+        f"{name}: запросов {result['queries']} против {base['queries']} в базе"
+    limit = base["p95_ms"] * (1 + TOLERANCE)
+    assert result["p95_ms"] <= limit, \
+        f"{name}: p95 {result['p95_ms']:.3f} мс против {base['p95_ms']:.3f} мс в базе (лимит {limit:.3f} мс)"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def save_results():
+    """
+    После всех замеров модуля сохраняет результаты в BENCH_RESULTS
+    """
+    yield
+    path = os.environ.get("BENCH_RESULTS", "bench_results.json")
+    if RESULTS:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(RESULTS, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+@pytest.fixture
+def busy_salon(make_dataset):
+    """
+    Салон с 50 мастерами, полностью занятыми на 7 дней с 2025-01-13
+    """
+    from bot.models import Salon
+    dataset = make_dataset(salons=1, specialists=50, procedures=20, days=7, occupancy=1.0,
+                           start_date=dt.date(2025, 1, 13))
+    return Salon.objects.get(id=dataset.salon_ids[0])
+
+
+# ============================================================================
+# БЕНЧМАРКИ
+# ============================================================================
+
+def test_percentile_interpolation():
+    """Проверка расчета перцентилей на известной выборке"""
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == pytest.approx(50.5)
+    assert percentile(samples, 99) == pytest.approx(99.01)
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_bench_is_free_time(busy_salon):
+    from funcs import is_free_time, AVAILABILITY_CACHE
+    result = run_benchmark(
+        "is_free_time_salon",
+        lambda: is_free_time("salon", busy_salon.id, dt.date(2025, 1, 15)),
+        setup=AVAILABILITY_CACHE.clear,
+    )
+    assert_no_regression("is_free_time_salon", result)
+
+
+def test_bench_get_salon_keyboard(bulk_salons):
+    from keyboards import get_salon_keyboard, KEYBOARD_CACHE
+    result = run_benchmark("get_salon_keyboard", get_salon_keyboard, setup=KEYBOARD_CACHE.clear)
+    assert_no_regression("get_salon_keyboard", result)
+
+
+def test_bench_get_procedure_keyboard(bulk_procedures):
+    from keyboards import get_procedure_keyboard, KEYBOARD_CACHE
+    result = run_benchmark("get_procedure_keyboard", get_procedure_keyboard, setup=KEYBOARD_CACHE.clear)
+    assert_no_regression("get_procedure_keyboard", result)
+
+
+def test_bench_get_time_slots_keyboard(busy_salon):
+    from funcs import AVAILABILITY_CACHE
+    from handlers import USER_DATA
+    from keyboards import get_time_slots_keyboard
+
+    chat_id = 31337
+    USER_DATA[chat_id] = {"salon": str(busy_salon.id), "date": "2025-01-15"}
+    result = run_benchmark("get_time_slots_keyboard", lambda: get_time_slots_keyboard(chat_id),
+                           setup=AVAILABILITY_CACHE.clear)
+    assert_no_regression("get_time_slots_keyboard", result)
+
+
+def test_bench_format_procedure_prices(bulk_procedures):
+    from handlers import format_procedure_prices, PRICE_LIST
+    result = run_benchmark("format_procedure_prices", format_procedure_prices, setup=PRICE_LIST.clear)
+    assert_no_regression("format_procedure_prices", result)
+
+
+def test_bench_button_handler_date_step(busy_salon):
+    from funcs import AVAILABILITY_CACHE
+    from handlers import USER_DATA, button_handler
+    from tests.conftest import DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext
+
+    chat_id = 31338
+    ctx = DummyContext(bot=DummyBot())
+
+    def setup():
+        AVAILABILITY_CACHE.clear()
+        USER_DATA[chat_id] = {"salon": str(busy_salon.id)}
+
+    result = run_benchmark(
+        "button_handler_date",
+        lambda: button_handler(DummyUpdate(cq=DummyCallbackQuery("date_2025-01-15", chat_id=chat_id)), ctx),
+        setup=setup,
+    )
+    assert_no_regression("button_handler_date", result)
@@ -63,6 +63,7 @@ def test_B5_parse_time_callback_updates_user_data(monkeypatch):
     assert ud["end_time"] == dt.time(15, 0)
 
 
+@pytest.mark.usefixtures("inline_outbound")
 def test_B6_parse_invalid_callback_sends_error(monkeypatch):
     from handlers import USER_DATA, button_handler
     from tests.conftest import DummyCallbackQuery, DummyUpdate, DummyContext, DummyBot
@@ -211,6 +212,7 @@ def test_B10_date_keyboard_no_past_dates(monkeypatch):
 # =====================================================
 # ТЕСТ Б11: Некорректный формат даты (негативный)
 # =====================================================
+@pytest.mark.usefixtures("inline_outbound")
 def test_B11_invalid_date_format_in_callback(monkeypatch):
     """
     Проверка обработки callback_data с некорректным форматом даты
@@ -230,16 +232,10 @@ def test_B11_invalid_date_format_in_callback(monkeypatch):
     # Вызываем обработчик (не должно быть исключения)
     button_handler(update, context)
 
-    # Проверяем, что дата не сохранилась или обработана корректно
-    # В текущей реализации некорректная дата просто сохранится как строка "2025-13-45"
-    # Это место для улучшения - нужна валидация
-    if "date" in USER_DATA[chat_id]:
-        # Если дата сохранилась, проверим, что она некорректная
-        saved_date = USER_DATA[chat_id]["date"]
-        assert saved_date == "2025-13-45"  # Сохранилась как есть (баг!)
-
-        # В идеале должна быть валидация:
-        # assert any("ошибка" in m["text"].lower() for m in bot.sent)
+    # Парсер маршрута date_ валидирует дату: некорректная дата не сохраняется,
+    # а пользователь получает сообщение из общего обработчика ошибок
+    assert "date" not in USER_DATA[chat_id]
+    assert any("ошиб" in m["text"].lower() for m in bot.sent)
 
 
 # =====================================================
@@ -330,3 +326,1287 @@ def test_B13_create_appointment_at_boundary_time(Models, salon, specialist, proc
 
     assert last_appointment.id is not None
     assert last_appointment.time == dt.time(18, 0)
+
+
+# =====================================================
+# ТЕСТ Б14: Пересекающиеся интервалы записей
+# =====================================================
+def test_B14_is_free_time_overlapping_intervals(Models, salon, specialist, procedure_cut, date_2025):
+    """
+    Проверка, что слот считается занятым при любом пересечении
+    с интервалом [start_time, end_time) записи, а не только при совпадении начала
+    """
+    from funcs import is_free_time
+    Appointment = Models["Appointment"]
+
+    # Запись 14:30-15:30 задевает слоты 14:00 и 15:00
+    Appointment.objects.create(
+        salon=salon,
+        specialist=specialist,
+        procedure=procedure_cut,
+        date=date_2025,
+        time=dt.time(14, 30),
+        client_name="Overlap",
+        client_phone="+7 900 000-00-01",
+        start_time=dt.time(14, 30),
+        end_time=dt.time(15, 30)
+    )
+
+    # Запись 11:00-12:00 заканчивается ровно на границе слота 12:00
+    Appointment.objects.create(
+        salon=salon,
+        specialist=specialist,
+        procedure=procedure_cut,
+        date=date_2025,
+        time=dt.time(11, 0),
+        client_name="Boundary",
+        client_phone="+7 900 000-00-02",
+        start_time=dt.time(11, 0),
+        end_time=dt.time(12, 0)
+    )
+
+    availability = is_free_time(entity_type="master", entity_id=specialist.id, date=date_2025)
+
+    assert availability.get(dt.time(13, 0)) is True
+    assert availability.get(dt.time(14, 0)) is False
+    assert availability.get(dt.time(15, 0)) is False
+    assert availability.get(dt.time(16, 0)) is True
+
+    # Интервал полуоткрытый: end_time 12:00 не занимает слот 12:00
+    assert availability.get(dt.time(11, 0)) is False
+    assert availability.get(dt.time(12, 0)) is True
+
+    # Форма результата прежняя: слоты 10:00..18:00 по порядку
+    assert list(availability) == [dt.time(h, 0) for h in range(10, 19)]
+
+
+# =====================================================
+# ТЕСТ Б15: is_free_time выполняет один SQL-запрос
+# =====================================================
+@pytest.mark.parametrize("entity_type", ["salon", "master"])
+def test_B15_is_free_time_single_query(entity_type, salon, specialist, appointment, date_2025,
+                                       django_assert_num_queries):
+    """
+    Проверка, что все слоты на дату вычисляются одним запросом к БД,
+    независимо от количества слотов в рабочем дне
+    """
+    from funcs import is_free_time
+
+    entity_id = salon.id if entity_type == "salon" else specialist.id
+
+    with django_assert_num_queries(1):
+        availability = is_free_time(entity_type=entity_type, entity_id=entity_id, date=date_2025)
+
+    assert availability.get(dt.time(14, 0)) is False
+
+
+# =====================================================
+# ТЕСТ Б16: Пакетная доступность мастеров по нескольким датам
+# =====================================================
+def test_B16_is_free_time_many_matches_single_calls(Models, salon, specialist, specialist2,
+                                                    procedure_cut, date_2025,
+                                                    django_assert_num_queries):
+    """
+    Проверка, что is_free_time_many возвращает для каждой пары мастер × дата
+    тот же результат, что и is_free_time, за один запрос к БД
+    """
+    from funcs import is_free_time, is_free_time_many
+    from tests.conftest import create_test_appointment
+
+    next_day = date_2025 + dt.timedelta(days=1)
+    create_test_appointment(Models, salon=salon, specialist=specialist, procedure=procedure_cut,
+                            date=date_2025, time=dt.time(14, 0),
+                            start_time=dt.time(14, 0), end_time=dt.time(15, 0))
+    create_test_appointment(Models, salon=salon, specialist=specialist2, procedure=procedure_cut,
+                            date=next_day, time=dt.time(10, 0),
+                            start_time=dt.time(10, 0), end_time=dt.time(11, 0))
+
+    ids = [specialist.id, specialist2.id]
+    dates = [date_2025, next_day]
+
+    with django_assert_num_queries(1):
+        grid = is_free_time_many("master", ids, dates)
+
+    assert set(grid) == set(ids)
+    for entity_id in ids:
+        assert set(grid[entity_id]) == set(dates)
+        for date in dates:
+            assert grid[entity_id][date] == is_free_time("master", entity_id, date)
+
+    assert grid[specialist.id][date_2025][dt.time(14, 0)] is False
+    assert grid[specialist2.id][next_day][dt.time(10, 0)] is False
+    assert grid[specialist2.id][date_2025][dt.time(10, 0)] is True
+
+
+def test_B17_is_free_time_many_empty_input(django_assert_num_queries):
+    """
+    Проверка граничного случая: пустой список мастеров или дат не обращается к БД
+    """
+    from funcs import is_free_time_many
+
+    with django_assert_num_queries(0):
+        assert is_free_time_many("master", [], [dt.date(2025, 1, 15)]) == {}
+        assert is_free_time_many("master", [1, 2], []) == {1: {}, 2: {}}
+
+
+# =====================================================
+# ТЕСТ Б18: Кеш доступности — попадания и промахи
+# =====================================================
+def test_B18_availability_cache_hits_and_misses(specialist, appointment, date_2025,
+                                                django_assert_num_queries):
+    """
+    Проверка, что повторный вызов is_free_time с тем же ключом
+    (entity_type, entity_id, date) берется из кеша без обращения к БД
+    """
+    from funcs import is_free_time, AVAILABILITY_CACHE
+
+    first = is_free_time("master", specialist.id, date_2025)
+    assert AVAILABILITY_CACHE.misses == 1
+    assert AVAILABILITY_CACHE.hits == 0
+
+    with django_assert_num_queries(0):
+        second = is_free_time("master", specialist.id, date_2025)
+
+    assert second == first
+    assert AVAILABILITY_CACHE.hits == 1
+
+    # Другая дата — другой ключ
+    is_free_time("master", specialist.id, date_2025 + dt.timedelta(days=1))
+    assert AVAILABILITY_CACHE.misses == 2
+
+
+# =====================================================
+# ТЕСТ Б19: Инвалидация кеша по сигналам Appointment
+# =====================================================
+def test_B19_availability_cache_invalidated_on_save_and_delete(Models, salon, specialist,
+                                                               procedure_cut, date_2025):
+    """
+    Проверка, что post_save/post_delete записи сбрасывают закешированную
+    доступность салона и мастера на дату записи
+    """
+    from funcs import is_free_time
+    from tests.conftest import create_test_appointment
+
+    assert is_free_time("salon", salon.id, date_2025)[dt.time(14, 0)] is True
+    assert is_free_time("master", specialist.id, date_2025)[dt.time(14, 0)] is True
+
+    appointment = create_test_appointment(Models, salon=salon, specialist=specialist,
+                                          procedure=procedure_cut, date=date_2025)
+
+    assert is_free_time("salon", salon.id, date_2025)[dt.time(14, 0)] is False
+    assert is_free_time("master", specialist.id, date_2025)[dt.time(14, 0)] is False
+
+    appointment.delete()
+
+    assert is_free_time("salon", salon.id, date_2025)[dt.time(14, 0)] is True
+    assert is_free_time("master", specialist.id, date_2025)[dt.time(14, 0)] is True
+
+
+# =====================================================
+# ТЕСТ Б20: LRU-вытеснение и TTL кеша доступности
+# =====================================================
+def test_B20_availability_cache_lru_and_ttl():
+    """
+    Проверка политики вытеснения: при переполнении уходит давно
+    не использованный ключ, а запись старше TTL считается промахом
+    """
+    from funcs import AvailabilityCache
+
+    now = [0.0]
+    cache = AvailabilityCache(maxsize=2, ttl=60, clock=lambda: now[0])
+    date = dt.date(2025, 1, 15)
+
+    cache.set(("master", 1, date), {dt.time(10, 0): True})
+    cache.set(("master", 2, date), {dt.time(10, 0): False})
+    assert cache.get(("master", 1, date)) is not None  # 1 становится «свежим»
+
+    cache.set(("master", 3, date), {dt.time(10, 0): True})
+    assert cache.get(("master", 2, date)) is None, "LRU-ключ должен быть вытеснен"
+    assert cache.get(("master", 1, date)) is not None
+
+    now[0] = 61.0
+    assert cache.get(("master", 1, date)) is None, "Запись старше TTL должна истечь"
+    assert len(cache) <= 2
+
+
+# =====================================================
+# ТЕСТ Б21: Битовая маска расписания дня
+# =====================================================
+def test_B21_day_schedule_bitmask_from_db(Models, salon, specialist, specialist2,
+                                          procedure_cut, date_2025):
+    """
+    Проверка, что DaySchedule строит по одной маске слотов на мастера
+    и отвечает на вопрос «свободен ли хоть один мастер» без обращения к БД
+    """
+    from funcs import DaySchedule, SLOT_TIMES
+    from tests.conftest import create_test_appointment
+
+    create_test_appointment(Models, salon=salon, specialist=specialist, procedure=procedure_cut,
+                            date=date_2025, time=dt.time(14, 0),
+                            start_time=dt.time(14, 0), end_time=dt.time(16, 0))
+    create_test_appointment(Models, salon=salon, specialist=specialist2, procedure=procedure_cut,
+                            date=date_2025, time=dt.time(14, 0),
+                            start_time=dt.time(14, 0), end_time=dt.time(15, 0))
+
+    schedule = DaySchedule.from_db(salon.id, date_2025,
+                                   specialist_ids=[specialist.id, specialist2.id])
+
+    assert schedule.masks.shape == (2,)
+    slot_14 = SLOT_TIMES.index(dt.time(14, 0))
+    slot_15 = SLOT_TIMES.index(dt.time(15, 0))
+    assert schedule.is_busy(specialist.id, dt.time(14, 0))
+    assert schedule.is_busy(specialist.id, dt.time(15, 0))
+    assert not schedule.is_busy(specialist2.id, dt.time(15, 0))
+    assert int(schedule.masks[0]) >> slot_14 & 1 == 1
+    assert int(schedule.masks[1]) >> slot_15 & 1 == 0
+
+    assert schedule.any_free(dt.time(14, 0)) is False
+    assert schedule.any_free(dt.time(15, 0)) is True
+    assert schedule.any_free(dt.time(10, 0)) is True
+
+
+# =====================================================
+# ТЕСТ Б22: Инкрементальное обновление маски совпадает с перестроением
+# =====================================================
+def test_B22_day_schedule_incremental_update(Models, salon, specialist, specialist2,
+                                             procedure_cut, date_2025):
+    """
+    Проверка, что добавление записи в готовое расписание дает ту же маску,
+    что и полное перестроение из bot.models.Appointment
+    """
+    from funcs import DaySchedule, is_free_time
+    from tests.conftest import create_test_appointment
+
+    ids = [specialist.id, specialist2.id]
+    schedule = DaySchedule.from_db(salon.id, date_2025, specialist_ids=ids)
+
+    appointment = create_test_appointment(Models, salon=salon, specialist=specialist2,
+                                          procedure=procedure_cut, date=date_2025,
+                                          time=dt.time(11, 0), start_time=dt.time(11, 0),
+                                          end_time=dt.time(12, 0))
+    schedule.add(appointment)
+
+    rebuilt = DaySchedule.from_db(salon.id, date_2025, specialist_ids=ids)
+    assert (schedule.masks == rebuilt.masks).all()
+    assert schedule.salon_availability() == is_free_time("salon", salon.id, date_2025)
+
+
+# =====================================================
+# ТЕСТ Б23: Хранилище сессий — истечение по TTL
+# =====================================================
+def test_B23_session_store_ttl_expiry():
+    """
+    Проверка, что незавершенная запись пользователя удаляется
+    из хранилища после TTL без обращений к ней.
+    Любое обращение (чтение, запись, проверка `in`) продлевает TTL
+    """
+    from sessions import SessionStore
+
+    now = [0.0]
+    store = SessionStore(max_entries=100, ttl=600, clock=lambda: now[0])
+
+    store[1] = {"salon": "1"}
+    now[0] = 300.0
+    assert store[1]["salon"] == "1"  # чтение продлевает сессию до 900-й секунды
+
+    now[0] = 850.0
+    assert 1 in store, "Сессия продлена обращением на 300-й секунде"  # продлевает до 1450-й
+
+    now[0] = 1000.0
+    assert 1 in store, "Проверка `in` на 850-й секунде тоже продлевает сессию"  # до 1600-й
+
+    now[0] = 1601.0
+    assert 1 not in store, "Сессия должна истечь через TTL после последнего обращения"
+    assert len(store) == 0
+
+
+# =====================================================
+# ТЕСТ Б24: Хранилище сессий — ограничение размера (LRU)
+# =====================================================
+def test_B24_session_store_lru_cap():
+    """
+    Проверка, что при превышении max_entries вытесняется
+    давно не использованная сессия, а не самая новая
+    """
+    from sessions import SessionStore
+
+    store = SessionStore(max_entries=3, ttl=600)
+    for chat_id in (1, 2, 3):
+        store[chat_id] = {"salon": str(chat_id)}
+
+    store[1]["procedure"] = "5"  # чат 1 снова активен
+    store[4] = {"salon": "4"}
+
+    assert len(store) == 3
+    assert 2 not in store
+    assert store[1]["procedure"] == "5"
+    assert store[4]["salon"] == "4"
+
+
+# =====================================================
+# ТЕСТ Б25: Компактный объект сессии
+# =====================================================
+def test_B25_booking_session_uses_slots():
+    """
+    Проверка, что сессия хранится в объекте со __slots__,
+    поддерживает прежний доступ по ключам и измеряемый размер
+    """
+    from sessions import BookingSession, SessionStore
+
+    session = BookingSession.from_dict({
+        "salon": "1",
+        "date": "2025-01-15",
+        "time": dt.time(14, 0),
+    })
+
+    assert not hasattr(session, "__dict__")
+    assert session["salon"] == "1"
+    assert session["time"] == dt.time(14, 0)
+    assert "master" not in session
+    assert session.get("master") is None
+
+    with pytest.raises(KeyError):
+        session["unknown_field"] = "x"
+
+    store = SessionStore(max_entries=10, ttl=600)
+    store[1] = session
+    assert store.memory_usage() > 0
+
+
+# =====================================================
+# ТЕСТ Б25а: handlers.USER_DATA — ограниченное хранилище сессий
+# =====================================================
+def test_B25a_user_data_is_bounded_session_store(monkeypatch, salon, date_2025):
+    """
+    Проверка, что handlers.USER_DATA — SessionStore с явными лимитами по умолчанию,
+    а button_handler, phone_handler и get_time_slots_keyboard работают через него
+    """
+    import handlers
+    import keyboards
+    from sessions import SessionStore, BookingSession, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+    from tests.conftest import DummyCallbackQuery, DummyUpdate, DummyContext, DummyBot
+
+    assert isinstance(handlers.USER_DATA, SessionStore)
+    assert handlers.USER_DATA.max_entries == DEFAULT_MAX_ENTRIES == 50_000
+    assert handlers.USER_DATA.ttl == DEFAULT_TTL == 24 * 60 * 60
+
+    # Маленькое хранилище, подставленное в handlers, видят все точки входа
+    store = SessionStore(max_entries=2, ttl=600)
+    monkeypatch.setattr(handlers, "USER_DATA", store)
+    ctx = DummyContext(bot=DummyBot())
+
+    for chat_id in (1, 2, 3):
+        handlers.button_handler(DummyUpdate(cq=DummyCallbackQuery(f"salon_{salon.id}", chat_id=chat_id)), ctx)
+
+    assert len(store) == 2
+    assert 1 not in store, "Самая старая сессия вытесняется"
+    assert isinstance(store[3], BookingSession)
+    assert store[3]["salon"] == str(salon.id)
+
+    store[3]["date"] = str(date_2025)
+    texts = [btn.text for row in keyboards.get_time_slots_keyboard(3).inline_keyboard for btn in row]
+    assert "10:00" in texts
+
+
+# =====================================================
+# ТЕСТ Б26: SQLite-бэкенд сессий — восстановление после перезапуска
+# =====================================================
+def test_B26_sqlite_session_backend_survives_restart(tmp_path):
+    """
+    Проверка, что состояние записи, сохраненное одним хранилищем,
+    читается новым хранилищем поверх того же файла SQLite
+    """
+    from sessions import SessionStore, SQLiteSessionBackend
+
+    path = tmp_path / "sessions.sqlite3"
+
+    store = SessionStore(max_entries=100, ttl=600, backend=SQLiteSessionBackend(path))
+    store[42] = {"salon": "3", "date": "2025-01-15", "time": dt.time(14, 0)}
+    store.flush()
+
+    restarted = SessionStore(max_entries=100, ttl=600, backend=SQLiteSessionBackend(path))
+    assert restarted[42]["salon"] == "3"
+    assert restarted[42]["time"] == dt.time(14, 0)
+    assert 43 not in restarted
+
+
+# =====================================================
+# ТЕСТ Б27: Объединение записей на диск и ленивое восстановление
+# =====================================================
+def test_B27_sqlite_session_backend_coalesces_and_loads_lazily(tmp_path):
+    """
+    Проверка, что серия изменений одного чата дает одну запись на диск,
+    а новое хранилище читает чат из бэкенда только при первом обращении
+    """
+    from sessions import SessionStore, SQLiteSessionBackend
+
+    path = tmp_path / "sessions.sqlite3"
+    backend = SQLiteSessionBackend(path)
+    store = SessionStore(max_entries=100, ttl=600, backend=backend)
+
+    store[7] = {}
+    for field, value in (("salon", "1"), ("procedure", "2"), ("date", "2025-01-15"),
+                         ("time", dt.time(10, 0)), ("start_time", dt.time(10, 0))):
+        store[7][field] = value
+    assert backend.writes == 0, "Изменения должны копиться до flush"
+
+    store.flush()
+    assert backend.writes == 1
+
+    backend = SQLiteSessionBackend(path)
+    restarted = SessionStore(max_entries=100, ttl=600, backend=backend)
+    assert backend.reads == 0, "При старте не должно быть массовой загрузки"
+
+    assert restarted[7]["procedure"] == "2"
+    assert restarted[7]["start_time"] == dt.time(10, 0)
+    assert backend.reads == 1, "Повторные чтения идут из кеша"
+
+
+# =====================================================
+# ТЕСТ Б27а: Автоматический сброс сессий на диск по интервалу
+# =====================================================
+def test_B27a_sqlite_session_backend_flushes_on_interval(tmp_path):
+    """
+    Проверка политики сброса без явного flush(): изменения копятся не дольше
+    flush_interval, затем первое же обращение к хранилищу пишет их одной записью
+    на чат; потеря при падении процесса ограничена этим интервалом
+    """
+    from sessions import SessionStore, SQLiteSessionBackend
+
+    path = tmp_path / "sessions.sqlite3"
+    now = [0.0]
+    backend = SQLiteSessionBackend(path)
+    store = SessionStore(max_entries=100, ttl=600, backend=backend,
+                         flush_interval=2.0, clock=lambda: now[0])
+
+    store[7] = {"salon": "1"}
+    store[8] = {"salon": "2"}
+    now[0] = 1.0
+    store[7]["procedure"] = "3"
+    store[7]["date"] = "2025-01-15"
+    assert backend.writes == 0, "В пределах интервала запись на диск откладывается"
+
+    now[0] = 2.5
+    assert 7 in store  # любое обращение после интервала сбрасывает накопленное
+    assert backend.writes == 2, "По одной записи на каждый измененный чат"
+
+    now[0] = 3.0
+    assert store[7]["procedure"] == "3"
+    assert backend.writes == 2, "Чтение без изменений не пишет на диск"
+
+    # «Падение» без flush(): на диске уже есть все, что старше интервала
+    restarted = SessionStore(max_entries=100, ttl=600, backend=SQLiteSessionBackend(path))
+    assert restarted[7]["date"] == "2025-01-15"
+    assert restarted[8]["salon"] == "2"
+
+
+# =====================================================
+# ТЕСТ Б28: Постраничная клавиатура салонов (keyset-пагинация)
+# =====================================================
+def test_B28_salon_keyboard_pages(bulk_salons):
+    """
+    Проверка, что клавиатура салонов выдает по SALON_PAGE_SIZE салонов,
+    а навигация кодирует курсор по id: salon_page_a<id> — вперед, salon_page_b<id> — назад
+    """
+    from keyboards import get_salon_keyboard, SALON_PAGE_SIZE
+    from tests.conftest import get_callback_data_list, get_callback_payloads
+
+    def salon_ids_of(keyboard):
+        return [p.salon_id for p in get_callback_payloads(keyboard, "salon")]
+
+    first = get_salon_keyboard()
+    first_data = get_callback_data_list(first)
+    salon_ids = salon_ids_of(first)
+
+    assert salon_ids == [s.id for s in bulk_salons[:SALON_PAGE_SIZE]]
+    assert f"salon_page_a{salon_ids[-1]}" in first_data
+    assert not any(d.startswith("salon_page_b") for d in first_data), "На первой странице нет кнопки «назад»"
+
+    second = get_salon_keyboard(cursor=f"a{salon_ids[-1]}")
+    second_data = get_callback_data_list(second)
+    assert bulk_salons[SALON_PAGE_SIZE].id in salon_ids_of(second)
+    assert f"salon_page_b{bulk_salons[SALON_PAGE_SIZE].id}" in second_data
+
+    back = get_salon_keyboard(cursor=f"b{bulk_salons[SALON_PAGE_SIZE].id}")
+    assert get_callback_data_list(back) == first_data
+
+    last = get_salon_keyboard(cursor=f"a{bulk_salons[-2].id}")
+    last_data = get_callback_data_list(last)
+    assert bulk_salons[-1].id in salon_ids_of(last)
+    assert not any(d.startswith("salon_page_a") for d in last_data), "На последней странице нет кнопки «вперед»"
+
+
+# =====================================================
+# ТЕСТ Б29: Страница салонов загружает только id и name
+# =====================================================
+def test_B29_salon_keyboard_page_single_narrow_query(bulk_salons):
+    """
+    Проверка, что страница выбирается одним запросом без OFFSET
+    и без лишних колонок салона
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from keyboards import get_salon_keyboard
+
+    with CaptureQueriesContext(connection) as ctx:
+        get_salon_keyboard(cursor=f"a{bulk_salons[20].id}")
+
+    assert len(ctx.captured_queries) == 1
+    sql = ctx.captured_queries[0]["sql"].lower()
+    assert "offset" not in sql
+    assert "address" not in sql and "email" not in sql
+
+
+# =====================================================
+# ТЕСТ Б30: Кеш готовых клавиатур салонов и процедур
+# =====================================================
+def test_B30_keyboard_cache_reuses_markup(salon, salon_b, procedure_cut, procedure_manicure,
+                                          django_assert_num_queries):
+    """
+    Проверка, что повторный запрос клавиатуры не обращается к БД
+    и не строит InlineKeyboardMarkup заново
+    """
+    from keyboards import get_salon_keyboard, get_procedure_keyboard, KEYBOARD_CACHE
+
+    first_salons = get_salon_keyboard()
+    first_procedures = get_procedure_keyboard()
+
+    with django_assert_num_queries(0):
+        assert get_salon_keyboard() is first_salons
+        assert get_procedure_keyboard() is first_procedures
+
+    assert KEYBOARD_CACHE.builds["salon"] == 1
+    assert KEYBOARD_CACHE.builds["procedure"] == 1
+
+
+# =====================================================
+# ТЕСТ Б31: Инвалидация кеша клавиатур по сигналам моделей
+# =====================================================
+def test_B31_keyboard_cache_invalidated_on_model_changes(Models, salon, procedure_cut):
+    """
+    Проверка, что save/delete Salon и Procedure сбрасывают
+    только соответствующую закешированную клавиатуру
+    """
+    from keyboards import get_salon_keyboard, get_procedure_keyboard, KEYBOARD_CACHE
+    from tests.conftest import assert_keyboard_contains_text
+
+    get_salon_keyboard()
+    get_procedure_keyboard()
+
+    salon.name = "Renamed Salon"
+    salon.save()
+    assert assert_keyboard_contains_text(get_salon_keyboard(), "Renamed Salon")
+    assert KEYBOARD_CACHE.builds["salon"] == 2
+    get_procedure_keyboard()
+    assert KEYBOARD_CACHE.builds["procedure"] == 1, "Изменение салона не трогает процедуры"
+
+    Procedure = Models["Procedure"]
+    Procedure.objects.create(name="Пилинг", price=1800.0)
+    procedure_cut.delete()
+    procedures = get_procedure_keyboard()
+    assert not any("Стрижка" in btn.text for row in procedures.inline_keyboard for btn in row)
+    assert any("Пилинг" in btn.text for row in procedures.inline_keyboard for btn in row)
+    assert KEYBOARD_CACHE.builds["procedure"] == 2
+
+
+# =====================================================
+# ТЕСТ Б32: Прайс-лист процедур берется из кеша
+# =====================================================
+def test_B32_procedure_prices_cached(procedure_cut, procedure_manicure, django_assert_num_queries):
+    """
+    Проверка, что повторный вызов format_procedure_prices
+    не читает Procedure и не форматирует строки заново
+    """
+    from handlers import format_procedure_prices, PRICE_LIST
+
+    text = format_procedure_prices()
+    rendered = PRICE_LIST.rendered_lines
+
+    with django_assert_num_queries(0):
+        assert format_procedure_prices() == text
+
+    assert PRICE_LIST.rendered_lines == rendered == 2
+
+
+# =====================================================
+# ТЕСТ Б33: Инкрементальное перестроение прайс-листа
+# =====================================================
+def test_B33_procedure_prices_rerender_changed_lines_only(Models, procedure_cut, procedure_manicure,
+                                                          procedure_coloring):
+    """
+    Проверка, что изменение одной процедуры перерисовывает одну строку,
+    а удаление убирает строку без перерисовки остальных
+    """
+    from handlers import format_procedure_prices, PRICE_LIST
+
+    format_procedure_prices()
+    assert PRICE_LIST.rendered_lines == 3
+
+    procedure_manicure.price = 2200.0
+    procedure_manicure.save()
+    text = format_procedure_prices()
+    assert "2200" in text and "2000" not in text
+    assert "Стрижка" in text and "Покраска волос" in text
+    assert PRICE_LIST.rendered_lines == 4, "Перерисована только измененная строка"
+
+    procedure_cut.delete()
+    text = format_procedure_prices()
+    assert "Стрижка" not in text
+    assert PRICE_LIST.rendered_lines == 4
+
+    Models["Procedure"].objects.create(name="Пилинг", price=1800.0)
+    text = format_procedure_prices()
+    assert "Пилинг" in text and "1800" in text and "рублей" in text
+    assert PRICE_LIST.rendered_lines == 5
+
+
+# =====================================================
+# ТЕСТ Б34: Разбиение прайс-листа на сообщения Telegram
+# =====================================================
+def test_B34_procedure_prices_pages_fit_message_limit(Models):
+    """
+    Проверка, что длинный прайс-лист разбивается на страницы
+    не длиннее лимита сообщения Telegram без разрыва строк
+    """
+    from handlers import format_procedure_price_pages, TELEGRAM_MESSAGE_LIMIT
+
+    Procedure = Models["Procedure"]
+    Procedure.objects.bulk_create([
+        Procedure(name=f"Процедура с очень длинным названием номер {i}", price=1000 + i)
+        for i in range(600)
+    ])
+
+    pages = format_procedure_price_pages()
+
+    assert len(pages) > 1
+    assert all(len(page) <= TELEGRAM_MESSAGE_LIMIT for page in pages)
+    lines = [line for page in pages for line in page.splitlines() if "длинным названием" in line]
+    assert len(lines) == 600, "Каждая процедура должна попасть ровно на одну страницу"
+
+
+# =====================================================
+# ТЕСТ Б35: Диспетчер сохраняет порядок апдейтов внутри чата
+# =====================================================
+def test_B35_dispatcher_orders_updates_per_chat():
+    """
+    Проверка, что апдейты одного chat_id обрабатываются строго по порядку
+    поступления, даже при нескольких рабочих потоках
+    """
+    import random
+    import time
+    from dispatcher import UpdateDispatcher
+    from tests.conftest import DummyCallbackQuery, DummyUpdate, DummyContext
+
+    processed = {}
+
+    def handler(update, context):
+        time.sleep(random.random() / 1000)
+        processed.setdefault(update.effective_chat.id, []).append(update.callback_query.data)
+
+    dispatcher = UpdateDispatcher(handler, workers=4)
+    ctx = DummyContext()
+    for step in range(20):
+        for chat_id in (1, 2, 3):
+            dispatcher.submit(DummyUpdate(cq=DummyCallbackQuery(f"step_{step}", chat_id=chat_id)), ctx)
+    dispatcher.join()
+    dispatcher.shutdown()
+
+    for chat_id in (1, 2, 3):
+        assert processed[chat_id] == [f"step_{step}" for step in range(20)]
+
+
+# =====================================================
+# ТЕСТ Б36: Разные чаты обрабатываются параллельно
+# =====================================================
+def test_B36_dispatcher_runs_chats_in_parallel():
+    """
+    Проверка, что медленный апдейт одного пользователя
+    не задерживает апдейты других пользователей
+    """
+    import threading
+    from dispatcher import UpdateDispatcher
+    from tests.conftest import DummyCallbackQuery, DummyUpdate, DummyContext
+
+    release = threading.Event()
+    fast_done = threading.Event()
+
+    def handler(update, context):
+        if update.effective_chat.id == 1:
+            release.wait(timeout=5)
+        else:
+            fast_done.set()
+
+    dispatcher = UpdateDispatcher(handler, workers=2)
+    ctx = DummyContext()
+    dispatcher.submit(DummyUpdate(cq=DummyCallbackQuery("slow", chat_id=1)), ctx)
+    dispatcher.submit(DummyUpdate(cq=DummyCallbackQuery("fast", chat_id=2)), ctx)
+
+    assert fast_done.wait(timeout=1), "Чат 2 ждал медленный апдейт чата 1"
+    release.set()
+    dispatcher.join()
+    dispatcher.shutdown()
+
+
+# =====================================================
+# ТЕСТ Б37: Ограничение очереди чата и метрики глубины
+# =====================================================
+def test_B37_dispatcher_backpressure_and_metrics():
+    """
+    Проверка, что переполненная очередь чата отклоняет апдейт по таймауту,
+    а метрики показывают текущую и максимальную глубину очередей
+    """
+    import queue
+    import threading
+    from dispatcher import UpdateDispatcher
+    from tests.conftest import DummyCallbackQuery, DummyUpdate, DummyContext
+
+    release = threading.Event()
+    dispatcher = UpdateDispatcher(lambda update, context: release.wait(timeout=5),
+                                  workers=1, max_queue_per_chat=2)
+    ctx = DummyContext()
+
+    def tap(data):
+        return DummyUpdate(cq=DummyCallbackQuery(data, chat_id=7))
+
+    dispatcher.submit(tap("a"), ctx)   # в обработке
+    dispatcher.submit(tap("b"), ctx)
+    dispatcher.submit(tap("c"), ctx)
+
+    with pytest.raises(queue.Full):
+        dispatcher.submit(tap("d"), ctx, timeout=0.05)
+
+    metrics = dispatcher.metrics()
+    assert metrics["queue_depth"][7] == 2
+    assert metrics["max_queue_depth"] >= 2
+    assert metrics["rejected"] == 1
+
+    release.set()
+    dispatcher.join()
+    assert dispatcher.metrics()["queue_depth"].get(7, 0) == 0
+    dispatcher.shutdown()
+
+
+# =====================================================
+# ТЕСТ Б38: Таблица маршрутов callback_data
+# =====================================================
+@pytest.mark.parametrize("data, route, args", [
+    ("agree", "agree", ()),
+    ("choose_procedure", "choose_procedure", ()),
+    ("salon_12", "salon", (12,)),
+    ("salon_page_a12", "salon_page", ("a", 12)),
+    ("salon_page_b12", "salon_page", ("b", 12)),
+    ("procedure_7", "procedure", (7,)),
+    ("date_2025-01-15", "date", (dt.date(2025, 1, 15),)),
+    ("time_2025-01-15_14:00", "time", (dt.date(2025, 1, 15), dt.time(14, 0))),
+])
+def test_B38_callback_router_resolves_routes(data, route, args):
+    """
+    Проверка, что каждый префикс callback_data сопоставлен одному обработчику,
+    а полезная нагрузка разбирается заранее скомпилированным парсером
+    """
+    from handlers import CALLBACK_ROUTER
+
+    resolved, parsed = CALLBACK_ROUTER.resolve(data)
+
+    assert resolved.name == route
+    assert parsed == args
+
+
+# =====================================================
+# ТЕСТ Б39: Некорректные payload уходят в общий обработчик ошибок
+# =====================================================
+@pytest.mark.parametrize("data", [
+    "salon_abc",
+    "procedure_",
+    "date_2025-13-45",
+    "time_2025-01-15_25:00",
+    "time_invalid_format",
+    "unknown_route",
+    "salon_page_x12",
+    "salon_page_a",
+    "salon_page_",
+])
+@pytest.mark.usefixtures("inline_outbound")
+def test_B39_callback_router_shared_error_path(data):
+    """
+    Проверка, что любой некорректный callback_data приводит к одному ответу
+    об ошибке и не меняет состояние записи пользователя
+    """
+    from handlers import USER_DATA, CALLBACK_ROUTER, CallbackPayloadError, button_handler
+    from tests.conftest import DummyCallbackQuery, DummyUpdate, DummyContext, DummyBot
+
+    with pytest.raises(CallbackPayloadError):
+        CALLBACK_ROUTER.resolve(data)
+
+    chat_id = 77
+    USER_DATA[chat_id] = {"salon": "1"}
+    bot = DummyBot()
+    button_handler(DummyUpdate(cq=DummyCallbackQuery(data, chat_id=chat_id)), DummyContext(bot=bot))
+
+    assert dict(USER_DATA[chat_id]) == {"salon": "1"}
+    assert len(bot.sent) == 1
+    assert "ошиб" in bot.sent[0]["text"].lower()
+
+
+# =====================================================
+# ТЕСТ Б40: Компактное кодирование callback_data
+# =====================================================
+def test_B40_callback_codec_roundtrip():
+    """
+    Проверка, что закодированный payload укладывается в 64 байта callback_data
+    и декодируется обратно без потерь
+    """
+    from callback_codec import encode_callback, decode_callback, CODEC_VERSION
+
+    data = encode_callback("time", salon_id=1234567, procedure_id=89, master_id=4321,
+                           date=dt.date(2025, 1, 15), slot=4)
+
+    assert len(data.encode("utf-8")) <= 64
+    assert len(data) < len("time_2025-01-15_14:00") + len("_1234567_89_4321")
+
+    payload = decode_callback(data)
+    assert payload.version == CODEC_VERSION
+    assert payload.kind == "time"
+    assert (payload.salon_id, payload.procedure_id, payload.master_id) == (1234567, 89, 4321)
+    assert payload.date == dt.date(2025, 1, 15)
+    assert payload.slot == 4
+    assert payload.time == dt.time(14, 0)
+
+
+# =====================================================
+# ТЕСТ Б41: Быстрое отклонение некорректного payload
+# =====================================================
+@pytest.mark.parametrize("data", [
+    "date_2025-13-45",
+    "time_2025-02-30_14:00",
+    "time_2025-01-15_09:00",
+    "salon_-1",
+    "",
+    "~~~not-base64~~~",
+])
+def test_B41_callback_codec_rejects_malformed(data):
+    """
+    Проверка, что некорректные строки и поврежденные бинарные payload
+    отклоняются с ValueError
+    """
+    from callback_codec import decode_callback
+
+    with pytest.raises(ValueError):
+        decode_callback(data)
+
+
+def test_B41a_callback_codec_rejects_tampered_binary():
+    """
+    Проверка, что усеченный payload и неизвестная версия кодека отклоняются
+    """
+    from callback_codec import encode_callback, decode_callback
+
+    data = encode_callback("date", salon_id=1, date=dt.date(2025, 1, 15))
+
+    with pytest.raises(ValueError):
+        decode_callback(data[:-2])
+    with pytest.raises(ValueError):
+        decode_callback(chr(ord(data[0]) + 1) + data[1:])
+
+
+# =====================================================
+# ТЕСТ Б42: Старые строковые payload декодируются во время выкатки
+# =====================================================
+@pytest.mark.parametrize("data, kind, fields", [
+    ("salon_12", "salon", {"salon_id": 12}),
+    ("procedure_7", "procedure", {"procedure_id": 7}),
+    ("date_2025-01-15", "date", {"date": dt.date(2025, 1, 15)}),
+    ("time_2025-01-15_14:00", "time", {"date": dt.date(2025, 1, 15), "time": dt.time(14, 0)}),
+])
+def test_B42_callback_codec_decodes_legacy_strings(data, kind, fields):
+    """
+    Проверка обратной совместимости: кнопки, отправленные до выкатки,
+    продолжают работать
+    """
+    from callback_codec import decode_callback
+
+    payload = decode_callback(data)
+
+    assert payload.kind == kind
+    for name, value in fields.items():
+        assert getattr(payload, name) == value
+
+
+# =====================================================
+# ТЕСТ Б42а: Клавиатуры отправляют компактные payload, бот их принимает
+# =====================================================
+def test_B42a_keyboards_emit_encoded_callbacks(salon, procedure_cut, date_2025):
+    """
+    Проверка, что клавиатуры салонов, процедур и времени выдают payload
+    callback_codec (не старые строки), а button_handler и маршрутизатор их принимают
+    """
+    from callback_codec import encode_callback, CODEC_VERSION
+    from handlers import USER_DATA, CALLBACK_ROUTER, button_handler
+    from keyboards import get_salon_keyboard, get_procedure_keyboard, get_time_slots_keyboard
+    from tests.conftest import (DummyCallbackQuery, DummyUpdate, DummyContext, DummyBot,
+                                get_callback_data_list, get_callback_payloads)
+
+    chat_id = 4242
+    USER_DATA[chat_id] = {"salon": str(salon.id), "date": str(date_2025)}
+
+    for keyboard, kind, count in ((get_salon_keyboard(), "salon", 1),
+                                  (get_procedure_keyboard(), "procedure", 1),
+                                  (get_time_slots_keyboard(chat_id), "time", 9)):
+        payloads = get_callback_payloads(keyboard, kind)
+        assert len(payloads) == count
+        assert all(p.version == CODEC_VERSION for p in payloads), "Клавиатура выдает старый строковый формат"
+        data = [d for d in get_callback_data_list(keyboard) if not d.startswith("salon_page_")]
+        assert all(len(d.encode("utf-8")) <= 64 for d in data)
+        assert not any(d.startswith(("salon_", "procedure_", "time_")) for d in data)
+
+    encoded_time = encode_callback("time", salon_id=salon.id, date=date_2025, slot=4)
+    route, args = CALLBACK_ROUTER.resolve(encoded_time)
+    assert route.name == "time"
+    assert args == (date_2025, dt.time(14, 0))
+
+    ctx = DummyContext(bot=DummyBot())
+    USER_DATA[chat_id] = {}
+    button_handler(DummyUpdate(cq=DummyCallbackQuery(encode_callback("salon", salon_id=salon.id),
+                                                     chat_id=chat_id)), ctx)
+    button_handler(DummyUpdate(cq=DummyCallbackQuery(encode_callback("procedure", procedure_id=procedure_cut.id),
+                                                     chat_id=chat_id)), ctx)
+    button_handler(DummyUpdate(cq=DummyCallbackQuery(encoded_time, chat_id=chat_id)), ctx)
+
+    ud = USER_DATA[chat_id]
+    assert ud["salon"] == str(salon.id)
+    assert ud["procedure"] == str(procedure_cut.id)
+    assert ud["date"] == str(date_2025)
+    assert ud["start_time"] == dt.time(14, 0)
+    assert ud["end_time"] == dt.time(15, 0)
+
+
+# =====================================================
+# ТЕСТ Б43: Атомарное резервирование — пересечение интервалов
+# =====================================================
+def test_B43_reserve_slot_detects_overlap(Models, salon, specialist, procedure_cut, date_2025, appointment):
+    """
+    Проверка, что резервирование пересекающегося интервала возвращает
+    типизированный конфликт вместо IntegrityError и ничего не вставляет
+    """
+    from funcs import reserve_slot, SlotConflict
+
+    result = reserve_slot(
+        salon_id=salon.id,
+        specialist_id=specialist.id,
+        procedure_id=procedure_cut.id,
+        date=date_2025,
+        start_time=dt.time(14, 30),
+        end_time=dt.time(15, 30),
+        client_name="Петр",
+        client_phone="+7 999 000-00-01",
+    )
+
+    assert isinstance(result, SlotConflict)
+    assert result.conflicting_id == appointment.id
+    assert Models["Appointment"].objects.count() == 1
+
+
+# =====================================================
+# ТЕСТ Б44: Атомарное резервирование — смежный интервал
+# =====================================================
+def test_B44_reserve_slot_allows_adjacent_interval(Models, salon, specialist, procedure_cut, date_2025,
+                                                   appointment):
+    """
+    Проверка, что интервал, начинающийся ровно в end_time существующей записи,
+    успешно резервируется
+    """
+    from funcs import reserve_slot, Reserved
+
+    result = reserve_slot(
+        salon_id=salon.id,
+        specialist_id=specialist.id,
+        procedure_id=procedure_cut.id,
+        date=date_2025,
+        start_time=dt.time(15, 0),
+        end_time=dt.time(16, 0),
+        client_name="Петр",
+        client_phone="+7 999 000-00-01",
+    )
+
+    assert isinstance(result, Reserved)
+    assert result.appointment.pk is not None
+    assert result.appointment.start_time == dt.time(15, 0)
+    assert Models["Appointment"].objects.count() == 2
+
+
+# =====================================================
+# ТЕСТ Б45: Временное удержание слота и его истечение
+# =====================================================
+def test_B45_slot_holds_expire_and_reap_in_bulk():
+    """
+    Проверка, что удержание видно до истечения TTL, не мешает владельцу,
+    а просроченные удержания снимаются одним вызовом reap()
+    """
+    from holds import SlotHolds
+
+    now = [0.0]
+    holds = SlotHolds(ttl=300, clock=lambda: now[0])
+    date = dt.date(2025, 1, 15)
+
+    holds.hold("salon", 1, date, dt.time(14, 0), chat_id=100)
+    for hour in range(10, 14):
+        now[0] += 10
+        holds.hold("salon", 1, date, dt.time(hour, 0), chat_id=200 + hour)
+
+    assert holds.held_times("salon", 1, date, exclude_chat=None) == {dt.time(h, 0) for h in range(10, 15)}
+    assert dt.time(14, 0) not in holds.held_times("salon", 1, date, exclude_chat=100)
+
+    now[0] = 305.0
+    assert dt.time(14, 0) not in holds.held_times("salon", 1, date, exclude_chat=None), \
+        "Просроченное удержание не должно учитываться даже до reap()"
+
+    now[0] = 400.0
+    assert holds.reap() == 5
+    assert len(holds) == 0
+
+
+# =====================================================
+# ТЕСТ Б46: Повторный выбор времени переносит удержание
+# =====================================================
+def test_B46_slot_holds_one_hold_per_chat():
+    """
+    Проверка, что пользователь держит не больше одного слота:
+    новый выбор времени снимает предыдущее удержание
+    """
+    from holds import SlotHolds
+
+    holds = SlotHolds(ttl=300)
+    date = dt.date(2025, 1, 15)
+
+    holds.hold("salon", 1, date, dt.time(14, 0), chat_id=100)
+    holds.hold("salon", 1, date, dt.time(16, 0), chat_id=100)
+
+    assert holds.held_times("salon", 1, date, exclude_chat=None) == {dt.time(16, 0)}
+    holds.release(chat_id=100)
+    assert len(holds) == 0
+
+
+# =====================================================
+# ТЕСТ Б47: Детерминированный генератор синтетических данных
+# =====================================================
+def test_B47_dataset_generator_is_deterministic(Models, make_dataset):
+    """
+    Проверка, что генератор соблюдает форму набора данных и долю занятости,
+    а при одинаковом seed создает те же записи
+    """
+    Appointment = Models["Appointment"]
+    fields = ("salon__name", "specialist__name", "procedure__name", "date", "start_time", "end_time")
+
+    dataset = make_dataset(salons=2, specialists=10, procedures=5, days=7, occupancy=0.5, seed=42)
+
+    assert len(dataset.salon_ids) == 2
+    assert len(dataset.specialist_ids) == 10
+    assert len(dataset.procedure_ids) == 5
+    assert dataset.appointments == Appointment.objects.count() == round(10 * 7 * 9 * 0.5)
+    first = sorted(Appointment.objects.values_list(*fields))
+
+    for model in ("Appointment", "Salon", "Specialist", "Procedure"):
+        Models[model].objects.all().delete()
+
+    make_dataset(salons=2, specialists=10, procedures=5, days=7, occupancy=0.5, seed=42)
+    assert sorted(Appointment.objects.values_list(*fields)) == first
+
+    Appointment.objects.all().delete()
+    make_dataset(salons=2, specialists=10, procedures=5, days=7, occupancy=0.5, seed=7)
+    assert sorted(Appointment.objects.values_list(*fields)) != first
+
+
+# =====================================================
+# ТЕСТ Б48: Составные индексы Appointment
+# =====================================================
+@pytest.mark.parametrize("columns", [
+    ["salon_id", "date"],
+    ["specialist_id", "date", "start_time"],
+    ["client_phone"],
+])
+def test_B48_appointment_composite_indexes(Models, columns):
+    """
+    Проверка, что в БД есть индексы под реальные выборки записей:
+    по салону и дате, по мастеру, дате и началу, по телефону клиента
+    """
+    from django.db import connection
+
+    table = Models["Appointment"]._meta.db_table
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+
+    indexed = [c["columns"] for c in constraints.values() if c["index"] or c["unique"]]
+    assert any(cols[:len(columns)] == columns for cols in indexed), \
+        f"Нет индекса с префиксом {columns}: {indexed}"
+
+
+# =====================================================
+# ТЕСТ Б49: Очередь исходящих сообщений — лимиты token bucket
+# =====================================================
+class FakeClock:
+    """Управляемые часы для очереди исходящих сообщений: sleep двигает время"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TimedBot:
+    """DummyBot, запоминающий время каждой отправки по FakeClock"""
+
+    def __init__(self, clock):
+        from tests.conftest import DummyBot
+        self.clock = clock
+        self.bot = DummyBot()
+        self.sent = self.bot.sent
+        self.sent_at = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent_at.append(self.clock())
+        return self.bot.send_message(chat_id, text, **kwargs)
+
+
+def test_B49_outbound_queue_global_rate_limit():
+    """
+    Проверка глобального token bucket: 90 сообщений в разные чаты
+    (лимит на чат не связывает) уходят не быстрее 30/с после начального
+    всплеска из 30 сообщений, а send() возвращается сразу
+    """
+    from outbound import OutboundQueue
+
+    clock = FakeClock()
+    bot = TimedBot(clock)
+    queue = OutboundQueue(bot, global_rate=30, per_chat_rate=1, clock=clock, sleep=clock.sleep)
+
+    for i in range(90):
+        queue.send(chat_id=i, text=f"msg {i}")
+    assert bot.sent == [], "send() только ставит сообщение в очередь"
+
+    queue.drain()
+
+    assert len(bot.sent) == 90
+    burst = 30
+    for n, sent_at in enumerate(bot.sent_at, start=1):
+        assert sent_at >= (n - burst) / 30 - 1e-9, \
+            f"Сообщение №{n} ушло в {sent_at:.3f} с, раньше глобального лимита 30/с"
+    for start in bot.sent_at:
+        in_window = sum(1 for t in bot.sent_at if start <= t < start + 1.0 - 1e-9)
+        assert in_window <= burst + 30, f"За секунду с {start:.3f} с ушло {in_window} сообщений"
+    assert bot.sent_at[-1] >= 2.0 - 1e-9, "90 сообщений при 30/с и всплеске 30 требуют не меньше 2 секунд"
+
+
+def test_B49a_outbound_queue_per_chat_rate_limit():
+    """
+    Проверка лимита на чат: сообщения одному чату идут не чаще per_chat_rate
+    и в порядке постановки, даже когда глобальный лимит не связывает
+    """
+    from outbound import OutboundQueue
+
+    clock = FakeClock()
+    bot = TimedBot(clock)
+    queue = OutboundQueue(bot, global_rate=1000, per_chat_rate=1, clock=clock, sleep=clock.sleep)
+
+    for i in range(3):
+        queue.send(chat_id=999, text=f"same chat {i}")
+    queue.drain()
+
+    assert [m["text"] for m in bot.sent] == ["same chat 0", "same chat 1", "same chat 2"]
+    gaps = [b - a for a, b in zip(bot.sent_at, bot.sent_at[1:])]
+    assert all(gap >= 1.0 - 1e-9 for gap in gaps), f"Интервалы между сообщениями чата: {gaps}"
+
+
+# =====================================================
+# ТЕСТ Б50: Очередь исходящих сообщений — приоритеты
+# =====================================================
+def test_B50_outbound_queue_interactive_before_bulk():
+    """
+    Проверка, что интерактивные ответы обгоняют массовые уведомления,
+    поставленные в очередь раньше
+    """
+    from outbound import OutboundQueue, INTERACTIVE, BULK
+    from tests.conftest import DummyBot
+
+    clock = FakeClock()
+    bot = DummyBot()
+    queue = OutboundQueue(bot, global_rate=30, per_chat_rate=1, clock=clock, sleep=clock.sleep)
+
+    for i in range(10):
+        queue.send(chat_id=100 + i, text=f"reminder {i}", priority=BULK)
+    queue.send(chat_id=1, text="Ваша запись подтверждена", priority=INTERACTIVE)
+
+    queue.drain()
+
+    assert bot.sent[0]["text"] == "Ваша запись подтверждена"
+    assert [m["text"] for m in bot.sent[1:]] == [f"reminder {i}" for i in range(10)]
+
+
+# =====================================================
+# ТЕСТ Б51: Очередь исходящих сообщений — повтор с backoff и метрики
+# =====================================================
+def test_B51_outbound_queue_retries_with_backoff():
+    """
+    Проверка, что при flood-ошибке сообщение повторяется с растущей паузой,
+    а метрики показывают глубину очереди, повторы и задержку отправки
+    """
+    from outbound import OutboundQueue
+    from tests.conftest import DummyBot
+
+    class FloodBot(DummyBot):
+        def __init__(self, failures):
+            super().__init__()
+            self.failures = failures
+
+        def send_message(self, chat_id, text, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("Flood control exceeded")
+            return super().send_message(chat_id, text, **kwargs)
+
+    clock = FakeClock()
+    bot = FloodBot(failures=3)
+    queue = OutboundQueue(bot, global_rate=30, per_chat_rate=1, clock=clock, sleep=clock.sleep,
+                          max_retries=5, backoff=0.5)
+
+    queue.send(chat_id=1, text="hello")
+    assert queue.metrics()["depth"] == 1
+
+    queue.drain()
+
+    assert [m["text"] for m in bot.sent] == ["hello"]
+    assert clock.now >= 0.5 + 1.0 + 2.0, "Паузы между повторами должны расти экспоненциально"
+    metrics = queue.metrics()
+    assert metrics["depth"] == 0
+    assert metrics["retries"] == 3
+    assert metrics["sent"] == 1
+    assert metrics["send_latency_p95"] >= 3.5
+
+
+def test_B52_outbound_queue_gives_up_after_max_retries():
+    """
+    Проверка, что сообщение отбрасывается после max_retries и не блокирует очередь
+    """
+    from outbound import OutboundQueue
+    from tests.conftest import DummyBot
+
+    class BrokenBot(DummyBot):
+        def send_message(self, chat_id, text, **kwargs):
+            if chat_id == 1:
+                raise RuntimeError("Flood control exceeded")
+            return super().send_message(chat_id, text, **kwargs)
+
+    clock = FakeClock()
+    bot = BrokenBot()
+    queue = OutboundQueue(bot, global_rate=30, per_chat_rate=1, clock=clock, sleep=clock.sleep,
+                          max_retries=2, backoff=0.1)
+
+    queue.send(chat_id=1, text="lost")
+    queue.send(chat_id=2, text="delivered")
+    queue.drain()
+
+    assert [m["text"] for m in bot.sent] == ["delivered"]
+    assert queue.metrics()["dropped"] == 1
@@ -13,6 +13,7 @@ def test_I1_get_salon_keyboard_lists_salons(salon, salon_b):
     assert salon_b.name in "".join(texts)
 
 
+@pytest.mark.usefixtures("inline_outbound")
 def test_I2_phone_handler_creates_appointment(Models, salon, specialist, procedure_cut, monkeypatch):
     from handlers import USER_DATA, phone_handler
     from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
@@ -228,6 +229,7 @@ def test_I8_no_circular_import_errors():
 # =====================================================
 # ТЕСТ И9: Интеграция между USER_DATA и базой данных
 # =====================================================
+@pytest.mark.usefixtures("inline_outbound")
 def test_I9_user_data_to_database_integration(Models, salon, specialist, procedure_cut):
     """
     Проверка полной интеграции: USER_DATA → handlers → database
@@ -273,3 +275,596 @@ def test_I9_user_data_to_database_integration(Models, salon, specialist, procedu
 
     # Проверяем, что пользователю отправлено подтверждение
     assert any("подтверждена" in m["text"].lower() for m in bot.sent)
+
+
+# =====================================================
+# ТЕСТ И10: Кеш доступности остается корректным после записи через бота
+# =====================================================
+def test_I10_availability_cache_after_phone_handler(salon, specialist, procedure_cut):
+    """
+    Проверка, что запись, созданная phone_handler, сразу видна в is_free_time,
+    даже если доступность на эту дату уже была закеширована
+    """
+    from funcs import is_free_time
+    from handlers import USER_DATA, phone_handler
+    from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
+
+    date = dt.date(2025, 1, 15)
+    assert is_free_time("master", specialist.id, date)[dt.time(14, 0)] is True
+    assert is_free_time("salon", salon.id, date)[dt.time(14, 0)] is True
+
+    chat_id = 1010
+    USER_DATA[chat_id] = {
+        "salon": str(salon.id),
+        "master": str(specialist.id),
+        "procedure": str(procedure_cut.id),
+        "date": "2025-01-15",
+        "time": dt.time(14, 0),
+        "start_time": dt.time(14, 0),
+        "end_time": dt.time(15, 0),
+    }
+
+    message = DummyMessage(text="+7 912 345 67 89", chat_id=chat_id, first_name="Ivan")
+    phone_handler(DummyUpdate(message=message), DummyContext(bot=DummyBot()))
+
+    assert is_free_time("master", specialist.id, date)[dt.time(14, 0)] is False
+    assert is_free_time("salon", salon.id, date)[dt.time(14, 0)] is False
+
+
+# =====================================================
+# ТЕСТ И11: Запись продолжается после перезапуска бота
+# =====================================================
+@pytest.mark.usefixtures("inline_outbound")
+def test_I11_booking_flow_survives_restart(Models, salon, specialist, procedure_cut, tmp_path, monkeypatch):
+    """
+    Проверка, что пользователь, выбравший салон, процедуру, дату и время
+    до перезапуска процесса, после перезапуска сразу вводит телефон
+    """
+    import handlers
+    from sessions import SessionStore, SQLiteSessionBackend
+    from tests.conftest import DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext, DummyMessage
+
+    path = tmp_path / "sessions.sqlite3"
+    chat_id = 2020
+    ctx = DummyContext(bot=DummyBot())
+
+    now = [0.0]
+    store = SessionStore(max_entries=100, ttl=600, backend=SQLiteSessionBackend(path),
+                         flush_interval=2.0, clock=lambda: now[0])
+    monkeypatch.setattr(handlers, "USER_DATA", store)
+
+    handlers.button_handler(DummyUpdate(cq=DummyCallbackQuery("agree", chat_id=chat_id)), ctx)
+    for data in (f"salon_{salon.id}", f"procedure_{procedure_cut.id}",
+                 "date_2025-01-15", "time_2025-01-15_14:00"):
+        handlers.button_handler(DummyUpdate(cq=DummyCallbackQuery(data, chat_id=chat_id)), ctx)
+    store[chat_id]["master"] = str(specialist.id)
+
+    # Без явного flush(): следующее обращение после flush_interval сбрасывает сессию на диск,
+    # дальше процесс «падает»
+    now[0] = 5.0
+    assert chat_id in store
+
+    # «Перезапуск»: новое хранилище поверх того же файла
+    restarted = SessionStore(max_entries=100, ttl=600, backend=SQLiteSessionBackend(path))
+    monkeypatch.setattr(handlers, "USER_DATA", restarted)
+
+    bot = DummyBot()
+    message = DummyMessage(text="+7 912 345 67 89", chat_id=chat_id, first_name="Ivan")
+    handlers.phone_handler(DummyUpdate(message=message), DummyContext(bot=bot))
+
+    Appointment = Models["Appointment"]
+    a = Appointment.objects.get()
+    assert a.salon_id == salon.id
+    assert a.procedure_id == procedure_cut.id
+    assert a.start_time == dt.time(14, 0)
+    assert any("подтверждена" in m["text"].lower() for m in bot.sent)
+
+
+# =====================================================
+# ТЕСТ И12: Переключение страниц салонов через button_handler
+# =====================================================
+@pytest.mark.usefixtures("inline_outbound")
+def test_I12_button_handler_routes_salon_pages(bulk_salons):
+    """
+    Проверка, что callback salon_page_<cursor> отправляет пользователю
+    следующую страницу салонов, не меняя выбранные данные записи
+    """
+    from handlers import USER_DATA, button_handler
+    from keyboards import SALON_PAGE_SIZE
+    from tests.conftest import DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext, get_callback_payloads
+
+    chat_id = 3030
+    bot = DummyBot()
+    ctx = DummyContext(bot=bot)
+    USER_DATA[chat_id] = {}
+
+    cursor = bulk_salons[SALON_PAGE_SIZE - 1].id
+    button_handler(DummyUpdate(cq=DummyCallbackQuery(f"salon_page_a{cursor}", chat_id=chat_id)), ctx)
+
+    keyboards_sent = [m["reply_markup"] for m in bot.sent if m["reply_markup"] is not None]
+    assert keyboards_sent, "Клавиатура следующей страницы не отправлена"
+    salon_ids = [p.salon_id for p in get_callback_payloads(keyboards_sent[-1], "salon")]
+    assert bulk_salons[SALON_PAGE_SIZE].id in salon_ids
+    assert bulk_salons[0].id not in salon_ids
+    assert "salon" not in USER_DATA[chat_id]
+
+
+# =====================================================
+# ТЕСТ И13: Асинхронный phone_handler создает запись
+# =====================================================
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("inline_outbound")
+def test_I13_async_phone_handler_creates_appointment(Models, salon, specialist, procedure_cut):
+    """
+    Проверка, что async_phone_handler выполняет ORM-запросы в пуле потоков
+    и создает ту же запись, что и синхронный phone_handler
+    """
+    import asyncio
+    from handlers import USER_DATA, async_phone_handler
+    from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
+
+    chat_id = 4040
+    USER_DATA[chat_id] = {
+        "salon": str(salon.id),
+        "master": str(specialist.id),
+        "procedure": str(procedure_cut.id),
+        "date": "2025-01-15",
+        "time": dt.time(14, 0),
+        "start_time": dt.time(14, 0),
+        "end_time": dt.time(15, 0),
+    }
+
+    bot = DummyBot()
+    message = DummyMessage(text="+7 912 345 67 89", chat_id=chat_id, first_name="Ivan")
+    asyncio.run(async_phone_handler(DummyUpdate(message=message), DummyContext(bot=bot)))
+
+    a = Models["Appointment"].objects.get()
+    assert a.salon_id == salon.id
+    assert a.specialist_id == specialist.id
+    assert a.start_time == dt.time(14, 0)
+    assert any("подтверждена" in m["text"].lower() for m in bot.sent)
+
+
+# =====================================================
+# ТЕСТ И14: Параллельные чаты не блокируют цикл событий
+# =====================================================
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("inline_outbound")
+def test_I14_async_button_handler_does_not_block_event_loop(salon, procedure_cut):
+    """
+    Проверка, что 20 чатов обрабатываются конкурентно, а цикл событий
+    продолжает выполнять другие задачи, пока ORM работает в пуле потоков
+    """
+    import asyncio
+    from handlers import USER_DATA, async_button_handler, ORM_MAX_WORKERS
+    from tests.conftest import DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext
+
+    chats = range(5000, 5020)
+    for chat_id in chats:
+        USER_DATA[chat_id] = {"salon": str(salon.id), "procedure": str(procedure_cut.id)}
+
+    async def main():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def heartbeat():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0)
+
+        beat = asyncio.create_task(heartbeat())
+        bots = [DummyBot() for _ in chats]
+        await asyncio.gather(*(
+            async_button_handler(DummyUpdate(cq=DummyCallbackQuery("date_2025-01-15", chat_id=chat_id)),
+                                 DummyContext(bot=bot))
+            for chat_id, bot in zip(chats, bots)
+        ))
+        done.set()
+        await beat
+        return ticks, bots
+
+    ticks, bots = asyncio.run(main())
+
+    assert ticks > len(chats), "Цикл событий блокировался на ORM-запросах"
+    assert all(bot.sent for bot in bots), "Каждый чат должен получить клавиатуру времени"
+    assert all(USER_DATA[chat_id]["date"] == "2025-01-15" for chat_id in chats)
+    assert 1 <= ORM_MAX_WORKERS <= 32, "Пул потоков для ORM должен быть ограничен"
+
+
+# =====================================================
+# ТЕСТ И15: Асинхронные построители клавиатур
+# =====================================================
+@pytest.mark.django_db(transaction=True)
+def test_I15_async_keyboards_match_sync(salon, salon_b, procedure_cut):
+    """
+    Проверка, что асинхронные построители клавиатур возвращают
+    те же кнопки, что и синхронные обертки
+    """
+    import asyncio
+    from handlers import USER_DATA
+    from keyboards import (
+        get_salon_keyboard, get_procedure_keyboard, get_time_slots_keyboard,
+        async_get_salon_keyboard, async_get_procedure_keyboard, async_get_time_slots_keyboard,
+    )
+    from tests.conftest import get_callback_data_list
+
+    chat_id = 6060
+    USER_DATA[chat_id] = {"salon": str(salon.id), "date": "2025-01-15"}
+
+    async def build():
+        return await asyncio.gather(
+            async_get_salon_keyboard(),
+            async_get_procedure_keyboard(),
+            async_get_time_slots_keyboard(chat_id),
+        )
+
+    salons, procedures, slots = asyncio.run(build())
+
+    assert get_callback_data_list(salons) == get_callback_data_list(get_salon_keyboard())
+    assert get_callback_data_list(procedures) == get_callback_data_list(get_procedure_keyboard())
+    assert get_callback_data_list(slots) == get_callback_data_list(get_time_slots_keyboard(chat_id))
+
+
+# =====================================================
+# ТЕСТ И16: phone_handler сообщает о занятом слоте
+# =====================================================
+@pytest.mark.usefixtures("inline_outbound")
+def test_I16_phone_handler_reports_slot_conflict(Models, salon, specialist, procedure_cut, appointment):
+    """
+    Проверка, что при попытке записаться на уже занятое время
+    пользователь получает сообщение о конфликте, а не ошибку БД
+    """
+    from handlers import USER_DATA, phone_handler
+    from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
+
+    chat_id = 8080
+    USER_DATA[chat_id] = {
+        "salon": str(salon.id),
+        "master": str(specialist.id),
+        "procedure": str(procedure_cut.id),
+        "date": "2025-01-15",
+        "time": dt.time(14, 0),
+        "start_time": dt.time(14, 0),
+        "end_time": dt.time(15, 0),
+    }
+
+    bot = DummyBot()
+    message = DummyMessage(text="+7 912 000 00 00", chat_id=chat_id, first_name="Late")
+    phone_handler(DummyUpdate(message=message), DummyContext(bot=bot))
+
+    assert Models["Appointment"].objects.count() == 1
+    assert any("занят" in m["text"].lower() for m in bot.sent)
+    assert not any("подтверждена" in m["text"].lower() for m in bot.sent)
+
+
+# =====================================================
+# ТЕСТ И17: Выбранное время удерживается для других пользователей
+# =====================================================
+def test_I17_time_callback_holds_slot_for_other_chats(Models, salon, specialist, procedure_cut):
+    """
+    Проверка, что после нажатия time_… слот пропадает из клавиатуры
+    времени других пользователей, а после записи удержание снимается
+    """
+    from handlers import USER_DATA, button_handler, phone_handler
+    from holds import SLOT_HOLDS
+    from keyboards import get_time_slots_keyboard
+    from tests.conftest import (DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext, DummyMessage,
+                                get_callback_payloads)
+
+    def offered_times(chat_id):
+        return {p.time for p in get_callback_payloads(get_time_slots_keyboard(chat_id), "time")}
+
+    holder, other = 9001, 9002
+    for chat_id in (holder, other):
+        USER_DATA[chat_id] = {"salon": str(salon.id), "master": str(specialist.id),
+                              "procedure": str(procedure_cut.id), "date": "2025-01-15"}
+
+    ctx = DummyContext(bot=DummyBot())
+    button_handler(DummyUpdate(cq=DummyCallbackQuery("time_2025-01-15_18:00", chat_id=holder)), ctx)
+
+    assert dt.time(18, 0) not in offered_times(other)
+    assert dt.time(18, 0) in offered_times(holder)
+
+    message = DummyMessage(text="+7 912 345 67 89", chat_id=holder, first_name="Ivan")
+    phone_handler(DummyUpdate(message=message), ctx)
+
+    assert Models["Appointment"].objects.filter(start_time=dt.time(18, 0)).exists()
+    assert len(SLOT_HOLDS) == 0, "После записи удержание снимается"
+
+
+# =====================================================
+# ТЕСТ И18: Экспорт и импорт записей через management-команды
+# =====================================================
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_I18_appointments_export_import_roundtrip(fmt, Models, bulk_appointments, tmp_path):
+    """
+    Проверка, что записи, выгруженные export_appointments, загружаются
+    обратно import_appointments с разрешением салона, мастера и процедуры
+    по естественным ключам (name)
+    """
+    from io import StringIO
+    from django.core.management import call_command
+
+    Appointment = Models["Appointment"]
+    path = tmp_path / f"appointments.{fmt}"
+    expected = sorted(Appointment.objects.values_list(
+        "salon__name", "specialist__name", "procedure__name", "date", "start_time", "end_time", "client_phone"))
+
+    call_command("export_appointments", str(path), format=fmt, stdout=StringIO())
+    assert "salon" in path.read_text(encoding="utf-8")
+
+    Appointment.objects.all().delete()
+    out = StringIO()
+    call_command("import_appointments", str(path), format=fmt, batch_size=25, stdout=out)
+
+    imported = sorted(Appointment.objects.values_list(
+        "salon__name", "specialist__name", "procedure__name", "date", "start_time", "end_time", "client_phone"))
+    assert imported == expected
+    assert "rows/s" in out.getvalue()
+
+
+# =====================================================
+# ТЕСТ И19: Конфликты unique_together при импорте
+# =====================================================
+def test_I19_import_appointments_skips_conflicts_per_batch(Models, bulk_appointments, tmp_path,
+                                                           django_assert_max_num_queries):
+    """
+    Проверка, что повторный импорт уже существующих записей не падает
+    на IntegrityError, а пропускает конфликты пачками и сообщает их число
+    """
+    from io import StringIO
+    from django.core.management import call_command
+
+    Appointment = Models["Appointment"]
+    path = tmp_path / "appointments.csv"
+    call_command("export_appointments", str(path), format="csv", stdout=StringIO())
+
+    out = StringIO()
+    # 100 строк пачками по 50: запросы на справочники и пачки, а не на каждую строку
+    with django_assert_max_num_queries(20):
+        call_command("import_appointments", str(path), format="csv", batch_size=50, stdout=out)
+
+    assert Appointment.objects.count() == len(bulk_appointments)
+    assert "conflicts: 100" in out.getvalue()
+
+
+# =====================================================
+# ТЕСТ И20: Management-команда генерации синтетических данных
+# =====================================================
+def test_I20_generate_dataset_command(Models):
+    """
+    Проверка, что команда generate_dataset принимает форму набора данных
+    из аргументов и сообщает число созданных записей
+    """
+    from io import StringIO
+    from django.core.management import call_command
+
+    out = StringIO()
+    call_command("generate_dataset", salons=3, specialists=12, procedures=4, days=5,
+                 occupancy=1.0, seed=1, stdout=out)
+
+    assert Models["Salon"].objects.count() == 3
+    assert Models["Specialist"].objects.count() == 12
+    assert Models["Appointment"].objects.count() == 12 * 5 * 9
+    assert str(12 * 5 * 9) in out.getvalue()
+
+
+# =====================================================
+# ТЕСТ И21: Бюджеты SQL-запросов горячих путей
+# =====================================================
+def test_I21_hot_paths_stay_within_query_budgets(bulk_appointments, bulk_salons, bulk_procedures,
+                                                 salon, specialist, procedure_cut, query_budget):
+    """
+    Проверка, что число запросов is_free_time, клавиатур и phone_handler
+    не растет вместе с объемом данных (защита от N+1)
+    """
+    from funcs import is_free_time, is_free_time_many
+    from handlers import USER_DATA, phone_handler
+    from keyboards import get_salon_keyboard, get_procedure_keyboard, get_time_slots_keyboard, get_date_keyboard
+    from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
+
+    date = dt.date(2025, 1, 12)
+    specialist_ids = sorted({a.specialist_id for a in bulk_appointments})
+
+    with query_budget("is_free_time"):
+        is_free_time("salon", salon.id, date)
+    with query_budget("is_free_time_many"):
+        is_free_time_many("master", specialist_ids, [date, date + dt.timedelta(days=1)])
+    with query_budget("get_salon_keyboard"):
+        get_salon_keyboard()
+    with query_budget("get_procedure_keyboard"):
+        get_procedure_keyboard()
+    with query_budget("get_date_keyboard"):
+        get_date_keyboard()
+
+    chat_id = 2121
+    USER_DATA[chat_id] = {"salon": str(salon.id), "date": "2025-01-20"}
+    with query_budget("get_time_slots_keyboard"):
+        get_time_slots_keyboard(chat_id)
+
+    USER_DATA[chat_id] = {
+        "salon": str(salon.id),
+        "master": str(specialist.id),
+        "procedure": str(procedure_cut.id),
+        "date": "2025-01-20",
+        "time": dt.time(14, 0),
+        "start_time": dt.time(14, 0),
+        "end_time": dt.time(15, 0),
+    }
+    message = DummyMessage(text="+7 912 345 67 89", chat_id=chat_id, first_name="Budget")
+    with query_budget("phone_handler"):
+        phone_handler(DummyUpdate(message=message), DummyContext(bot=DummyBot()))
+
+
+# =====================================================
+# ТЕСТ И22: Метрики обработчиков в формате Prometheus
+# =====================================================
+def test_I22_metrics_export_per_route(metrics_enabled, salon, specialist, procedure_cut, tmp_path):
+    """
+    Проверка, что шаги записи попадают в гистограммы задержки по маршрутам,
+    с числом и временем SQL-запросов на апдейт, размером хранилища сессий
+    и попаданиями в кеши, а выгрузка идет в текстовом формате Prometheus
+    """
+    from handlers import USER_DATA, button_handler, phone_handler
+    from tests.conftest import DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext, DummyMessage
+
+    chat_id = 2222
+    ctx = DummyContext(bot=DummyBot())
+    USER_DATA[chat_id] = {"master": str(specialist.id)}
+    for data in (f"salon_{salon.id}", f"procedure_{procedure_cut.id}", "date_2025-01-15", "date_2025-01-15",
+                 "time_2025-01-15_14:00"):
+        button_handler(DummyUpdate(cq=DummyCallbackQuery(data, chat_id=chat_id)), ctx)
+    phone_handler(DummyUpdate(message=DummyMessage(text="+7 912 345 67 89", chat_id=chat_id)), ctx)
+
+    text = metrics_enabled.render()
+
+    assert "# TYPE beauty_bot_handler_latency_seconds histogram" in text
+    assert 'beauty_bot_handler_latency_seconds_count{route="date"} 2' in text
+    assert 'beauty_bot_handler_latency_seconds_count{route="phone"} 1' in text
+    assert 'beauty_bot_handler_latency_seconds_bucket{route="salon",le="+Inf"} 1' in text
+    assert "beauty_bot_update_db_queries_total" in text
+    assert "beauty_bot_update_db_seconds_total" in text
+    assert "beauty_bot_sessions " in text
+    assert 'beauty_bot_cache_hits_total{cache="availability"}' in text
+    assert 'beauty_bot_cache_misses_total{cache="availability"}' in text
+
+    path = tmp_path / "metrics.prom"
+    metrics_enabled.dump(path)
+    assert path.read_text(encoding="utf-8") == metrics_enabled.render()
+
+
+def test_I23_metrics_disabled_records_nothing(metrics_disabled, salon):
+    """
+    Проверка, что при выключенных метриках обработчики ничего не накапливают
+    """
+    from handlers import USER_DATA, button_handler
+    from tests.conftest import DummyBot, DummyCallbackQuery, DummyUpdate, DummyContext
+
+    METRICS = metrics_disabled
+    assert not METRICS.enabled
+
+    USER_DATA[1] = {}
+    button_handler(DummyUpdate(cq=DummyCallbackQuery(f"salon_{salon.id}", chat_id=1)),
+                   DummyContext(bot=DummyBot()))
+
+    assert "beauty_bot_handler_latency_seconds_count" not in METRICS.render()
+
+
+# =====================================================
+# ТЕСТ И30: Напоминания о записях по окну времени
+# =====================================================
+def _book_via_bot(chat_id, salon, specialist, procedure, date, hour):
+    """Создает запись через phone_handler, чтобы у нее был chat_id клиента"""
+    from handlers import USER_DATA, phone_handler
+    from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
+
+    USER_DATA[chat_id] = {
+        "salon": str(salon.id),
+        "master": str(specialist.id),
+        "procedure": str(procedure.id),
+        "date": str(date),
+        "time": dt.time(hour, 0),
+        "start_time": dt.time(hour, 0),
+        "end_time": dt.time(hour + 1, 0),
+    }
+    message = DummyMessage(text=f"+7 900 000-00-{chat_id % 100:02d}", chat_id=chat_id, first_name="Client")
+    phone_handler(DummyUpdate(message=message), DummyContext(bot=DummyBot()))
+
+
+@pytest.mark.usefixtures("inline_outbound")
+def test_I30_reminder_scheduler_sends_once_within_window(Models, salon, specialist, procedure_cut,
+                                                         django_assert_max_num_queries):
+    """
+    Проверка, что планировщик напоминаний за один тик находит записи,
+    начинающиеся в окне, отправляет каждому клиенту одно напоминание
+    и не повторяет его на следующих тиках
+    """
+    from reminders import ReminderScheduler
+    from tests.conftest import DummyBot
+
+    date = dt.date(2025, 1, 15)
+    _book_via_bot(101, salon, specialist, procedure_cut, date, 14)
+    _book_via_bot(102, salon, specialist, procedure_cut, date, 15)
+    _book_via_bot(103, salon, specialist, procedure_cut, date, 18)
+
+    now = [dt.datetime(2025, 1, 15, 12, 30)]
+    bot = DummyBot()
+    scheduler = ReminderScheduler(bot, window=dt.timedelta(hours=3), clock=lambda: now[0])
+
+    # Один индексированный скан + одна отметка отправленных
+    with django_assert_max_num_queries(2):
+        assert scheduler.tick() == 2
+
+    assert sorted(m["chat_id"] for m in bot.sent) == [101, 102]
+    assert all("14:00" in m["text"] or "15:00" in m["text"] for m in bot.sent)
+
+    assert scheduler.tick() == 0, "Напоминание не должно уходить дважды"
+
+    now[0] = dt.datetime(2025, 1, 15, 15, 30)
+    assert scheduler.tick() == 1
+    assert bot.sent[-1]["chat_id"] == 103
+    assert len(bot.sent) == 3
+
+
+@pytest.mark.usefixtures("inline_outbound")
+def test_I31_reminder_scheduler_skips_past_and_survives_restart(Models, salon, specialist, procedure_cut):
+    """
+    Проверка, что уже начавшиеся записи не напоминаются, а отметка об отправке
+    хранится в БД и новый экземпляр планировщика не отправляет повторно
+    """
+    from reminders import ReminderScheduler
+    from tests.conftest import DummyBot
+
+    date = dt.date(2025, 1, 15)
+    _book_via_bot(201, salon, specialist, procedure_cut, date, 10)
+    _book_via_bot(202, salon, specialist, procedure_cut, date, 13)
+
+    clock = lambda: dt.datetime(2025, 1, 15, 12, 0)
+    bot = DummyBot()
+    assert ReminderScheduler(bot, window=dt.timedelta(hours=2), clock=clock).tick() == 1
+    assert [m["chat_id"] for m in bot.sent] == [202]
+
+    restarted = ReminderScheduler(bot, window=dt.timedelta(hours=2), clock=clock)
+    assert restarted.tick() == 0
+    assert Models["Appointment"].objects.filter(reminder_sent_at__isnull=False).count() == 1
+
+
+# =====================================================
+# ТЕСТ И32: Хендлеры отправляют сообщения через очередь
+# =====================================================
+def test_I32_handlers_send_through_outbound_queue(salon, specialist, procedure_cut):
+    """
+    Проверка, что phone_handler не ждет отправки подтверждения:
+    сообщение ставится в очередь и доставляется рабочим потоком
+    """
+    from outbound import OUTBOUND, INTERACTIVE
+    from handlers import USER_DATA, phone_handler
+    from tests.conftest import DummyUpdate, DummyContext, DummyBot, DummyMessage
+
+    chat_id = 3232
+    USER_DATA[chat_id] = {
+        "salon": str(salon.id),
+        "master": str(specialist.id),
+        "procedure": str(procedure_cut.id),
+        "date": "2025-01-15",
+        "time": dt.time(14, 0),
+        "start_time": dt.time(14, 0),
+        "end_time": dt.time(15, 0),
+    }
+
+    bot = DummyBot()
+    message = DummyMessage(text="+7 912 345 67 89", chat_id=chat_id, first_name="Ivan")
+
+    # Рабочий поток еще не запущен: хендлер только ставит подтверждение в очередь
+    phone_handler(DummyUpdate(message=message), DummyContext(bot=bot))
+    assert bot.sent == [], "Хендлер не должен ждать отправки"
+    metrics = OUTBOUND.metrics()
+    assert metrics["depth"] == 1
+    assert metrics["depth_by_priority"][INTERACTIVE] == 1
+
+    with OUTBOUND.running():
+        OUTBOUND.join(timeout=5)
+
+    assert OUTBOUND.metrics()["depth"] == 0
+    assert any("подтверждена" in m["text"].lower() for m in bot.sent)
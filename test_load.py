@@ -1,3 +1,4 @@
+import os
 import time
 import datetime as dt
 import pytest
@@ -8,52 +9,28 @@ pytestmark = pytest.mark.django_db
 # =====================================================
 # ТЕСТ Н1: Производительность is_free_time при большом объеме данных
 # =====================================================
-def test_N1_is_free_time_with_large_dataset(Models, salon):
+def test_N1_is_free_time_with_large_dataset(Models, make_dataset):
     """
     Проверить производительность функции is_free_time при работе с
     большим количеством записей в БД (1 вызов при 10,000 записей)
     """
     from funcs import is_free_time
-    from bot.models import Specialist, Procedure
 
     Appointment = Models["Appointment"]
 
-    # Создаем базовые данные
-    procedure = Procedure.objects.create(name="TestProc", price=1000)
-    specialists = [Specialist.objects.create(name=f"Master{i}") for i in range(100)]
-
-    # Создаем 10,000 записей Appointment на разные даты
+    # Создаем 10,000+ записей Appointment на разные даты: 40 мастеров × 28 дней × 9 часов
     print("\n[N1] Создание 10,000 записей...")
-    appointments_created = 0
+    dataset = make_dataset(salons=1, specialists=40, procedures=1, days=28, occupancy=1.0,
+                           start_date=dt.date(2025, 1, 1))
+    salon_id = dataset.salon_ids[0]
 
-    for day in range(1, 29):  # 28 дней
-        for hour in range(10, 19):  # 9 часов в день
-            for spec_idx in range(min(40, 100)):  # До 40 мастеров используем
-                if appointments_created >= 10000:
-                    break
-                specialist = specialists[spec_idx]
-                Appointment.objects.create(
-                    salon=salon,
-                    specialist=specialist,
-                    procedure=procedure,
-                    date=dt.date(2025, 1, day),
-                    time=dt.time(hour, 0),
-                    client_name=f"Client{appointments_created}",
-                    client_phone=f"+7 900 {appointments_created:07d}",
-                    start_time=dt.time(hour, 0),
-                    end_time=dt.time(hour + 1, 0)
-                )
-                appointments_created += 1
-        if appointments_created >= 10000:
-            break
-
-    print(f"[N1] Создано {appointments_created} записей")
+    print(f"[N1] Создано {dataset.appointments} записей")
     assert Appointment.objects.count() >= 10000, "Недостаточно записей для теста"
 
     # ОДИН запрос is_free_time при большом объеме данных
     print("[N1] Выполнение 1 вызова is_free_time с 10,000 записями в БД...")
     start = time.time()
-    availability = is_free_time("salon", salon.id, dt.date(2025, 1, 15))
+    availability = is_free_time("salon", salon_id, dt.date(2025, 1, 15))
     elapsed = time.time() - start
 
     print(f"[N1] Время выполнения: {elapsed:.3f} сек")
@@ -66,7 +43,7 @@ def test_N1_is_free_time_with_large_dataset(Models, salon):
 # =====================================================
 # ТЕСТ Н2: Производительность создания записи при большом объеме данных
 # =====================================================
-def test_N2_create_appointment_with_large_dataset(Models, salon, procedure_cut):
+def test_N2_create_appointment_with_large_dataset(Models, salon, procedure_cut, make_dataset):
     """
     Проверить производительность создания записи Appointment
     при наличии большого объема данных в таблице (1 создание при 50,000 записей)
@@ -77,33 +54,11 @@ def test_N2_create_appointment_with_large_dataset(Models, salon, procedure_cut):
 
     print("\n[N2] Создание 50,000 существующих записей...")
 
-    # Создаем 200 мастеров для разнообразия
-    specialists = [Specialist.objects.create(name=f"Master{i}") for i in range(200)]
+    # 200 мастеров × 28 дней × 9 часов = 50,400 записей
+    dataset = make_dataset(salons=1, specialists=200, procedures=1, days=28, occupancy=1.0,
+                           start_date=dt.date(2025, 1, 1))
 
-    # Создаем 50,000 записей
-    appointments_created = 0
-    for day in range(1, 29):  # 28 дней
-        for hour in range(10, 19):  # 9 часов в день
-            for spec_idx in range(200):  # Все мастера
-                if appointments_created >= 50000:
-                    break
-                specialist = specialists[spec_idx]
-                Appointment.objects.create(
-                    salon=salon,
-                    specialist=specialist,
-                    procedure=procedure_cut,
-                    date=dt.date(2025, 1, day),
-                    time=dt.time(hour, 0),
-                    client_name=f"ExistingClient{appointments_created}",
-                    client_phone=f"+7 911 {appointments_created:07d}",
-                    start_time=dt.time(hour, 0),
-                    end_time=dt.time(hour + 1, 0)
-                )
-                appointments_created += 1
-        if appointments_created >= 50000:
-            break
-
-    print(f"[N2] Создано {appointments_created} существующих записей")
+    print(f"[N2] Создано {dataset.appointments} существующих записей")
     assert Appointment.objects.count() >= 50000, "Недостаточно записей для теста"
 
     # Создаем нового мастера для новой записи (чтобы не нарушить unique_together)
@@ -138,9 +93,10 @@ def test_N2_create_appointment_with_large_dataset(Models, salon, procedure_cut):
 def test_N3_salon_keyboard_with_large_dataset(Models):
     """
     Проверить производительность генерации клавиатуры get_salon_keyboard()
-    при большом количестве салонов в БД (1 вызов при 1,000 салонов)
+    при большом количестве салонов в БД: страница строится за постоянное время
+    независимо от ее номера (1,000 салонов)
     """
-    from keyboards import get_salon_keyboard
+    from keyboards import get_salon_keyboard, SALON_PAGE_SIZE
     from bot.models import Salon
 
     print("\n[N3] Создание 1,000 салонов...")
@@ -159,18 +115,25 @@ def test_N3_salon_keyboard_with_large_dataset(Models):
     print(f"[N3] Создано {Salon.objects.count()} салонов")
     assert Salon.objects.count() >= 1000, "Недостаточно салонов для теста"
 
-    # ОДИН вызов генерации клавиатуры при 1,000 салонов
-    print("[N3] Генерация клавиатуры для 1,000 салонов...")
+    # Первая и последняя страницы должны строиться одинаково быстро (keyset-пагинация)
+    print("[N3] Генерация первой страницы клавиатуры при 1,000 салонов...")
     start = time.time()
     keyboard = get_salon_keyboard()
     elapsed = time.time() - start
 
-    print(f"[N3] Время генерации: {elapsed:.3f} сек")
+    last_id = Salon.objects.order_by("-id").values_list("id", flat=True)[SALON_PAGE_SIZE]
+    start = time.time()
+    last_keyboard = get_salon_keyboard(cursor=f"a{last_id}")
+    last_elapsed = time.time() - start
+
+    print(f"[N3] Время генерации: первая {elapsed:.3f} сек, последняя {last_elapsed:.3f} сек")
 
     # Проверяем результат и производительность
     assert keyboard is not None, "Клавиатура не создалась"
-    assert len(keyboard.inline_keyboard) >= 1000, "Клавиатура содержит меньше салонов, чем ожидалось"
-    assert elapsed < 0.2, f"Генерация слишком медленная: {elapsed:.3f} сек (лимит: 0.2 сек)"
+    assert len(keyboard.inline_keyboard) == SALON_PAGE_SIZE + 1, "Страница: салоны + строка навигации"
+    assert len(last_keyboard.inline_keyboard) == SALON_PAGE_SIZE + 1, "Последняя страница неполная"
+    assert elapsed < 0.02, f"Генерация слишком медленная: {elapsed:.3f} сек (лимит: 0.02 сек)"
+    assert last_elapsed < 0.02, f"Последняя страница слишком медленная: {last_elapsed:.3f} сек (лимит: 0.02 сек)"
 
 
 # =====================================================
@@ -185,6 +148,10 @@ def test_N4_user_data_with_large_dataset(monkeypatch):
 
     USER_DATA.clear()
 
+    # USER_DATA — ограниченное хранилище сессий: тест рассчитан на то,
+    # что лимит по умолчанию вмещает всех 10,000 пользователей без вытеснения
+    assert USER_DATA.max_entries >= 10000, "Лимит USER_DATA меньше числа пользователей теста"
+
     print("\n[N4] Заполнение USER_DATA для 10,000 пользователей...")
 
     # Заполняем USER_DATA для 10,000 пользователей
@@ -225,12 +192,12 @@ def test_N4_user_data_with_large_dataset(monkeypatch):
 # =====================================================
 # ТЕСТ Н5: Производительность Django Admin при большой выборке
 # =====================================================
-def test_N5_admin_with_large_dataset(client, django_user_model):
+def test_N5_admin_with_large_dataset(client, django_user_model, make_dataset):
     """
     Проверить производительность Django Admin при отображении списка записей
     с большой выборкой (1 запрос при 100,000 записей)
     """
-    from bot.models import Appointment, Salon, Specialist, Procedure
+    from bot.models import Appointment
     from django.urls import reverse
 
     print("\n[N5] Создание данных для админки...")
@@ -239,47 +206,12 @@ def test_N5_admin_with_large_dataset(client, django_user_model):
     admin = django_user_model.objects.create_superuser("admin", "admin@example.com", "pass")
     client.login(username="admin", password="pass")
 
-    # Создаем базовые сущности
-    salon = Salon.objects.create(
-        name="LoadTestSalon",
-        address="Address",
-        phone="+7 999 000-00-00",
-        opening_time=dt.time(10, 0),
-        closing_time=dt.time(19, 0)
-    )
+    # Создаем 10,000+ записей: 40 мастеров × 28 дней × 9 часов
+    print("[N5] Создание 10,000 записей для теста админки...")
+    dataset = make_dataset(salons=1, specialists=40, procedures=1, days=28, occupancy=1.0,
+                           start_date=dt.date(2025, 1, 1))
 
-    specialists = [
-        Specialist.objects.create(name=f"AdminMaster{i}", specialization="Test")
-        for i in range(20)
-    ]
-
-    procedure = Procedure.objects.create(name="AdminProc", price=1000)
-
-    # Создаем 100,000 записей (упрощенно - можем сделать меньше для скорости теста)
-    print("[N5] Создание 10,000 записей для теста админки...")  # Уменьшено для скорости
-    appointments_created = 0
-
-    for day in range(1, 29):  # 28 дней
-        for hour in range(10, 19):  # 9 часов
-            for spec in specialists:
-                if appointments_created >= 10000:  # Ограничиваем 10,000 для ускорения теста
-                    break
-                Appointment.objects.create(
-                    salon=salon,
-                    specialist=spec,
-                    procedure=procedure,
-                    date=dt.date(2025, 1, day),
-                    time=dt.time(hour, 0),
-                    client_name=f"AdminClient{appointments_created}",
-                    client_phone=f"+7 922 {appointments_created:07d}",
-                    start_time=dt.time(hour, 0),
-                    end_time=dt.time(hour + 1, 0)
-                )
-                appointments_created += 1
-        if appointments_created >= 10000:
-            break
-
-    print(f"[N5] Создано {appointments_created} записей")
+    print(f"[N5] Создано {dataset.appointments} записей")
     assert Appointment.objects.count() >= 10000, "Недостаточно записей для теста"
 
     # ОДИН запрос к админке при большой выборке
@@ -357,3 +289,528 @@ def test_N6_is_free_time_on_busy_date(Models, salon, procedure_cut):
     assert elapsed < 0.8, f"Запрос слишком медленный: {elapsed:.3f} сек (лимит: 0.8 сек)"
 
     print("[N6] Все временные слоты корректно помечены как занятые")
+
+
+# =====================================================
+# ТЕСТ Н7: Пакетная доступность мастеров × дат против цикла вызовов
+# =====================================================
+def test_N7_is_free_time_many_grid(Models, salon, procedure_cut):
+    """
+    Проверить, что is_free_time_many строит сетку «50 мастеров × 7 дней»
+    за один проход и быстрее эквивалентного цикла вызовов is_free_time
+    """
+    from funcs import is_free_time, is_free_time_many
+    from bot.models import Specialist
+
+    Appointment = Models["Appointment"]
+
+    print("\n[N7] Создание расписания 50 мастеров на 7 дней...")
+
+    specialists = [Specialist.objects.create(name=f"GridMaster{i}") for i in range(50)]
+    dates = [dt.date(2025, 1, 13) + dt.timedelta(days=d) for d in range(7)]
+
+    appointments = []
+    for d_idx, date in enumerate(dates):
+        for s_idx, spec in enumerate(specialists):
+            hour = 10 + (s_idx + d_idx) % 9
+            appointments.append(Appointment(
+                salon=salon,
+                specialist=spec,
+                procedure=procedure_cut,
+                date=date,
+                time=dt.time(hour, 0),
+                client_name=f"GridClient{d_idx}_{s_idx}",
+                client_phone=f"+7 944 {d_idx:02d}{s_idx:05d}",
+                start_time=dt.time(hour, 0),
+                end_time=dt.time(hour + 1, 0)
+            ))
+    Appointment.objects.bulk_create(appointments)
+
+    ids = [spec.id for spec in specialists]
+
+    print("[N7] Цикл is_free_time по 350 парам мастер × дата...")
+    start = time.time()
+    looped = {entity_id: {date: is_free_time("master", entity_id, date) for date in dates}
+              for entity_id in ids}
+    loop_elapsed = time.time() - start
+
+    print("[N7] Один вызов is_free_time_many...")
+    start = time.time()
+    grid = is_free_time_many("master", ids, dates)
+    batch_elapsed = time.time() - start
+
+    print(f"[N7] Цикл: {loop_elapsed:.3f} сек, пакет: {batch_elapsed:.3f} сек")
+
+    # Проверяем результат и производительность
+    assert grid == looped, "Пакетный результат расходится с поштучными вызовами"
+    assert batch_elapsed < loop_elapsed, "Пакетный вызов не быстрее цикла"
+    assert batch_elapsed < 0.2, f"Пакетный запрос слишком медленный: {batch_elapsed:.3f} сек (лимит: 0.2 сек)"
+
+
+# =====================================================
+# ТЕСТ Н8: Векторизованная доступность салона по битовым маскам
+# =====================================================
+def test_N8_day_schedule_vectorized_salon_queries(Models, salon, procedure_cut):
+    """
+    Проверить, что при 50 полностью занятых мастерах DaySchedule
+    совпадает с is_free_time("salon", ...) и отвечает на вопрос
+    «есть ли свободный мастер в 15:00» за микросекунды
+    """
+    from funcs import DaySchedule, is_free_time
+    from bot.models import Specialist
+
+    Appointment = Models["Appointment"]
+
+    print("\n[N8] Создание максимально загруженной даты...")
+
+    specialists = [Specialist.objects.create(name=f"MaskMaster{i}") for i in range(50)]
+    target_date = dt.date(2025, 1, 15)
+
+    Appointment.objects.bulk_create([
+        Appointment(
+            salon=salon,
+            specialist=spec,
+            procedure=procedure_cut,
+            date=target_date,
+            time=dt.time(hour, 0),
+            client_name=f"MaskClient{s_idx}_{hour}",
+            client_phone=f"+7 955 {s_idx:04d}{hour:03d}",
+            start_time=dt.time(hour, 0),
+            end_time=dt.time(hour + 1, 0)
+        )
+        for s_idx, spec in enumerate(specialists)
+        for hour in range(10, 19)
+    ])
+
+    start = time.time()
+    schedule = DaySchedule.from_db(salon.id, target_date,
+                                   specialist_ids=[spec.id for spec in specialists])
+    build_elapsed = time.time() - start
+
+    assert schedule.salon_availability() == is_free_time("salon", salon.id, target_date)
+
+    print("[N8] 10,000 запросов any_free(15:00)...")
+    start = time.time()
+    for _ in range(10000):
+        free = schedule.any_free(dt.time(15, 0))
+    query_elapsed = (time.time() - start) / 10000
+
+    print(f"[N8] Построение: {build_elapsed:.3f} сек, запрос: {query_elapsed * 1e6:.2f} мкс")
+
+    # Проверяем результат и производительность
+    assert free is False, "Все мастера заняты в 15:00"
+    assert build_elapsed < 0.3, f"Построение слишком медленное: {build_elapsed:.3f} сек (лимит: 0.3 сек)"
+    assert query_elapsed < 50e-6, f"Запрос слишком медленный: {query_elapsed * 1e6:.2f} мкс (лимит: 50 мкс)"
+
+
+# =====================================================
+# ТЕСТ Н9: Память хранилища сессий при 10,000 пользователей
+# =====================================================
+def test_N9_session_store_memory_per_session():
+    """
+    Проверить, что хранилище сессий ограничено по размеру и тратит
+    на одну сессию меньше памяти, чем словарь строк и объектов time
+    """
+    import sys
+    from sessions import SessionStore
+
+    store = SessionStore(max_entries=5000, ttl=600)
+
+    print("\n[N9] Заполнение хранилища для 10,000 пользователей...")
+    for chat_id in range(1, 10001):
+        store[chat_id] = {
+            "salon": str(chat_id % 100 + 1),
+            "master": str(chat_id % 50 + 1),
+            "procedure": str(chat_id % 20 + 1),
+            "date": "2025-01-15",
+            "time": dt.time(14, 0),
+            "start_time": dt.time(14, 0),
+            "end_time": dt.time(15, 0)
+        }
+
+    per_session = store.memory_usage() / len(store)
+    plain_dict = sys.getsizeof({key: None for key in (
+        "salon", "master", "procedure", "date", "time", "start_time", "end_time")})
+
+    print(f"[N9] Сессий: {len(store)}, байт на сессию: {per_session:.0f} (dict: {plain_dict})")
+
+    # Проверяем ограничение и компактность
+    assert len(store) == 5000, "Хранилище должно держать не больше max_entries сессий"
+    assert 10000 in store and 1 not in store, "Должны вытесняться самые старые сессии"
+    assert per_session < plain_dict, "Сессия должна быть компактнее словаря"
+
+
+# =====================================================
+# ТЕСТ Н10: Кеш клавиатур под нагрузкой
+# =====================================================
+def test_N10_keyboard_cache_under_load(bulk_salons, bulk_procedures):
+    """
+    Проверить, что 10,000 запросов клавиатур салонов и процедур
+    строят каждую клавиатуру ровно один раз
+    """
+    from keyboards import get_salon_keyboard, get_procedure_keyboard, KEYBOARD_CACHE
+
+    print("\n[N10] 10,000 запросов клавиатур салонов и процедур...")
+    start = time.time()
+    for _ in range(5000):
+        get_salon_keyboard()
+        get_procedure_keyboard()
+    elapsed = time.time() - start
+
+    print(f"[N10] Время: {elapsed:.3f} сек, построений: {dict(KEYBOARD_CACHE.builds)}")
+
+    # Проверяем счетчики построений и производительность
+    assert KEYBOARD_CACHE.builds["salon"] == 1, "Клавиатура салонов перестраивалась"
+    assert KEYBOARD_CACHE.builds["procedure"] == 1, "Клавиатура процедур перестраивалась"
+    assert elapsed < 0.2, f"Выдача из кеша слишком медленная: {elapsed:.3f} сек (лимит: 0.2 сек)"
+
+
+# =====================================================
+# ТЕСТ Н11: Перестроение прайс-листа большого каталога
+# =====================================================
+def test_N11_procedure_prices_incremental_rebuild(Models):
+    """
+    Проверить, что после изменения одной процедуры в каталоге из 5,000
+    прайс-лист перестраивается перерисовкой одной строки
+    """
+    from handlers import format_procedure_prices, PRICE_LIST
+
+    Procedure = Models["Procedure"]
+    Procedure.objects.bulk_create([
+        Procedure(name=f"Процедура {i}", price=1000 + i) for i in range(5000)
+    ])
+
+    print("\n[N11] Первое построение прайс-листа для 5,000 процедур...")
+    format_procedure_prices()
+    rendered = PRICE_LIST.rendered_lines
+
+    procedure = Procedure.objects.get(name="Процедура 2500")
+    procedure.price = 9999
+    procedure.save()
+
+    start = time.time()
+    text = format_procedure_prices()
+    elapsed = time.time() - start
+
+    print(f"[N11] Перестроение после 1 изменения: {elapsed:.3f} сек")
+
+    # Проверяем результат и производительность
+    assert "9999" in text
+    assert PRICE_LIST.rendered_lines == rendered + 1, "Перерисовываться должна одна строка"
+    assert elapsed < 0.05, f"Перестроение слишком медленное: {elapsed:.3f} сек (лимит: 0.05 сек)"
+
+
+# =====================================================
+# ТЕСТ Н12: Стоимость маршрутизации callback_data
+# =====================================================
+@pytest.mark.parametrize("data", [
+    "agree",
+    "salon_12",
+    "procedure_7",
+    "date_2025-01-15",
+    "time_2025-01-15_14:00",
+])
+def test_N12_callback_router_dispatch_cost(data):
+    """
+    Проверить стоимость разбора одного callback_data для каждого типа маршрута
+    (100,000 разборов без обращения к БД)
+    """
+    from handlers import CALLBACK_ROUTER
+
+    for _ in range(1000):  # прогрев
+        CALLBACK_ROUTER.resolve(data)
+
+    start = time.perf_counter()
+    for _ in range(100000):
+        CALLBACK_ROUTER.resolve(data)
+    per_call = (time.perf_counter() - start) / 100000
+
+    print(f"\n[N12] {data}: {per_call * 1e6:.2f} мкс на разбор")
+
+    assert per_call < 20e-6, f"Разбор слишком медленный: {per_call * 1e6:.2f} мкс (лимит: 20 мкс)"
+
+
+# =====================================================
+# ТЕСТ Н13: Декодирование callback_data без strptime
+# =====================================================
+def test_N13_callback_codec_decode_cost():
+    """
+    Проверить, что декодирование бинарного payload быстрее разбора
+    строкового формата через split и strptime (100,000 декодирований)
+    """
+    from callback_codec import encode_callback, decode_callback
+
+    data = encode_callback("time", salon_id=12, procedure_id=7, master_id=3,
+                           date=dt.date(2025, 1, 15), slot=4)
+    legacy = "time_2025-01-15_14:00"
+
+    start = time.perf_counter()
+    for _ in range(100000):
+        decode_callback(data)
+    binary_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100000):
+        _, date_str, time_str = legacy.split("_")
+        dt.datetime.strptime(date_str, "%Y-%m-%d")
+        dt.datetime.strptime(time_str, "%H:%M")
+    strptime_elapsed = time.perf_counter() - start
+
+    print(f"\n[N13] Бинарный: {binary_elapsed:.3f} сек, strptime: {strptime_elapsed:.3f} сек")
+
+    assert binary_elapsed < strptime_elapsed, "Декодирование должно обходиться без strptime"
+    assert binary_elapsed / 100000 < 5e-6, f"Декодирование слишком медленное: {binary_elapsed / 100000 * 1e6:.2f} мкс"
+
+
+# =====================================================
+# ТЕСТ Н14: Конкурентное резервирование одного слота
+# =====================================================
+@pytest.mark.django_db(transaction=True)
+def test_N14_reserve_slot_concurrent_stress(Models, salon, specialist, procedure_cut):
+    """
+    Проверить, что при одновременном резервировании пересекающихся интервалов
+    из 16 потоков слот достается ровно одному клиенту
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import connection
+    from funcs import reserve_slot, Reserved, SlotConflict
+
+    Appointment = Models["Appointment"]
+    target_date = dt.date(2025, 1, 15)
+    barrier = threading.Barrier(16)
+    starts = [dt.time(14, 0), dt.time(14, 30)]
+
+    def attempt(i):
+        barrier.wait()
+        try:
+            start = starts[i % 2]
+            return reserve_slot(
+                salon_id=salon.id,
+                specialist_id=specialist.id,
+                procedure_id=procedure_cut.id,
+                date=target_date,
+                start_time=start,
+                end_time=(dt.datetime.combine(target_date, start) + dt.timedelta(hours=1)).time(),
+                client_name=f"Racer{i}",
+                client_phone=f"+7 966 {i:07d}",
+            )
+        finally:
+            connection.close()
+
+    print("\n[N14] 16 потоков резервируют пересекающиеся интервалы...")
+    for round_no in range(5):
+        Appointment.objects.all().delete()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(attempt, range(16)))
+
+        reserved = [r for r in results if isinstance(r, Reserved)]
+        conflicts = [r for r in results if isinstance(r, SlotConflict)]
+
+        assert len(reserved) == 1, f"Раунд {round_no}: слот забронирован {len(reserved)} раз"
+        assert len(conflicts) == 15, "Остальные попытки должны вернуть SlotConflict"
+        assert Appointment.objects.filter(specialist=specialist, date=target_date).count() == 1
+
+    print("[N14] Двойных бронирований не обнаружено")
+
+
+# =====================================================
+# ТЕСТ Н15: Потоковый импорт и экспорт большого объема записей
+# =====================================================
+def test_N15_appointments_streaming_import_export(Models, salon, procedure_cut, tmp_path):
+    """
+    Проверить скорость импорта 50,000 строк пачками и то, что экспорт
+    работает в постоянной памяти независимо от числа строк
+    """
+    import csv
+    import tracemalloc
+    from io import StringIO
+    from django.core.management import call_command
+    from bot.models import Specialist
+
+    Appointment = Models["Appointment"]
+    specialists = [Specialist.objects.create(name=f"ImportMaster{i}") for i in range(200)]
+
+    path = tmp_path / "import.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["salon", "specialist", "procedure", "date", "time",
+                         "start_time", "end_time", "client_name", "client_phone"])
+        rows = 0
+        for day in range(1, 29):
+            for hour in range(10, 19):
+                for spec in specialists:
+                    if rows >= 50000:
+                        break
+                    writer.writerow([salon.name, spec.name, procedure_cut.name, f"2025-01-{day:02d}",
+                                     f"{hour:02d}:00", f"{hour:02d}:00", f"{hour + 1:02d}:00",
+                                     f"ImportClient{rows}", f"+7 977 {rows:07d}"])
+                    rows += 1
+
+    print("\n[N15] Импорт 50,000 строк...")
+    start = time.time()
+    call_command("import_appointments", str(path), format="csv", batch_size=2000, stdout=StringIO())
+    import_elapsed = time.time() - start
+    assert Appointment.objects.count() == 50000
+
+    def export_peak(limit):
+        tracemalloc.start()
+        call_command("export_appointments", str(tmp_path / f"export_{limit}.jsonl"),
+                     format="jsonl", limit=limit, stdout=StringIO())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    small_peak = export_peak(5000)
+    large_peak = export_peak(50000)
+
+    print(f"[N15] Импорт: {50000 / import_elapsed:.0f} rows/s, "
+          f"пик памяти экспорта: {small_peak / 1024:.0f} КБ / {large_peak / 1024:.0f} КБ")
+
+    # Проверяем производительность и постоянство памяти
+    assert import_elapsed < 10.0, f"Импорт слишком медленный: {import_elapsed:.3f} сек (лимит: 10 сек)"
+    assert large_peak < small_peak * 2, "Память экспорта растет вместе с числом строк"
+
+
+# =====================================================
+# ТЕСТ Н16: Скорость генератора синтетических данных
+# =====================================================
+@pytest.mark.parametrize("appointments", [
+    100_000,
+    pytest.param(1_000_000, marks=pytest.mark.skipif(
+        not os.environ.get("BEAUTY_BOT_HUGE_LOAD"), reason="1M записей: задайте BEAUTY_BOT_HUGE_LOAD=1")),
+])
+def test_N16_dataset_generator_speed(Models, make_dataset, appointments):
+    """
+    Проверить, что генератор создает сотни тысяч записей за секунды
+    (bulk_create вместо Appointment.objects.create на каждую строку)
+    """
+    specialists = appointments // (100 * 9)
+
+    print(f"\n[N16] Генерация {appointments:,} записей...")
+    start = time.time()
+    dataset = make_dataset(salons=10, specialists=specialists, procedures=50, days=100, occupancy=1.0)
+    elapsed = time.time() - start
+
+    print(f"[N16] Время генерации: {elapsed:.3f} сек ({dataset.appointments / elapsed:.0f} rows/s)")
+
+    # Проверяем результат и производительность
+    assert Models["Appointment"].objects.count() == dataset.appointments >= appointments * 0.99
+    assert elapsed < appointments / 50000, \
+        f"Генерация слишком медленная: {elapsed:.3f} сек (лимит: {appointments / 50000:.0f} сек)"
+
+
+# =====================================================
+# ТЕСТ Н17: Накладные расходы выключенных метрик
+# =====================================================
+def test_N17_metrics_disabled_overhead(metrics_disabled):
+    """
+    Проверить, что замер маршрута при выключенных метриках стоит
+    порядка вызова пустой функции (1,000,000 замеров)
+    """
+    METRICS = metrics_disabled
+
+    start = time.perf_counter()
+    for _ in range(1000000):
+        with METRICS.track("date"):
+            pass
+    per_call = (time.perf_counter() - start) / 1000000
+
+    print(f"\n[N17] Замер при выключенных метриках: {per_call * 1e9:.0f} нс")
+
+    assert per_call < 1e-6, f"Накладные расходы слишком велики: {per_call * 1e9:.0f} нс (лимит: 1000 нс)"
+
+
+# =====================================================
+# ТЕСТ Н18: Страница списка записей в админке при 100,000 и 1,000,000 строк
+# =====================================================
+@pytest.mark.parametrize("appointments", [
+    100_000,
+    pytest.param(1_000_000, marks=pytest.mark.skipif(
+        not os.environ.get("BEAUTY_BOT_HUGE_LOAD"), reason="1M записей: задайте BEAUTY_BOT_HUGE_LOAD=1")),
+])
+def test_N18_admin_changelist_latency(client, django_user_model, make_dataset, appointments):
+    """
+    Проверить время загрузки первой, последней страницы и страницы
+    фильтра по дате в changelist записей при большой истории
+    """
+    from bot.models import Appointment
+    from django.urls import reverse
+
+    django_user_model.objects.create_superuser("admin", "admin@example.com", "pass")
+    client.login(username="admin", password="pass")
+
+    print(f"\n[N18] Создание {appointments:,} записей...")
+    make_dataset(salons=10, specialists=appointments // (100 * 9), procedures=50, days=100,
+                 occupancy=1.0, start_date=dt.date(2025, 1, 1))
+
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_changelist")
+
+    # Последняя страница — та, которую предлагает сам пагинатор admin
+    # (list_per_page строк на странице, номера в ?p= с 1)
+    first_page = client.get(url)
+    paginator = first_page.context["cl"].paginator
+    last_page = paginator.num_pages
+    assert last_page >= Appointment.objects.count() // paginator.per_page * 0.9, \
+        "Оценка числа страниц слишком далека от реальной"
+
+    pages = {
+        "первая": url,
+        f"последняя (p={last_page})": f"{url}?p={last_page}",
+        "дата": f"{url}?date__year=2025&date__month=2&date__day=15",
+    }
+
+    for label, page_url in pages.items():
+        start = time.time()
+        response = client.get(page_url)
+        elapsed = time.time() - start
+
+        print(f"[N18] Страница «{label}»: {elapsed:.3f} сек")
+
+        assert response.status_code == 200, f"Страница «{label}» не загрузилась"
+        assert len(response.context["cl"].result_list) > 0, f"Страница «{label}» пустая"
+        assert elapsed < 1.0, f"Страница «{label}» слишком медленная: {elapsed:.3f} сек (лимит: 1.0 сек)"
+
+
+# =====================================================
+# ТЕСТ Н19: Память потоковой выгрузки CSV из админки
+# =====================================================
+def test_N19_admin_csv_export_flat_memory(client, django_user_model, make_dataset):
+    """
+    Проверить, что выгрузка 100,000 записей начинает отдавать байты сразу,
+    а пиковая память не растет вместе с объемом выгрузки
+    """
+    import tracemalloc
+    from bot.models import Appointment
+    from django.urls import reverse
+
+    django_user_model.objects.create_superuser("admin", "admin@example.com", "pass")
+    client.login(username="admin", password="pass")
+
+    print("\n[N19] Создание 100,000+ записей...")
+    make_dataset(salons=10, specialists=112, procedures=50, days=100, occupancy=1.0,
+                 start_date=dt.date(2025, 1, 1))
+    url = reverse(f"admin:{Appointment._meta.app_label}_appointment_export_csv")
+
+    def export(params):
+        tracemalloc.start()
+        start = time.time()
+        response = client.get(url, params)
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        first_byte = time.time() - start
+        total = sum(len(chunk) for chunk in chunks)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return first_byte, total, peak
+
+    _, small_total, small_peak = export({"date__gte": "2025-01-01", "date__lte": "2025-01-10"})
+    first_byte, large_total, large_peak = export({})
+
+    print(f"[N19] Первый байт: {first_byte:.3f} сек, выгружено {large_total / 1e6:.1f} МБ, "
+          f"пик памяти: {small_peak / 1024:.0f} КБ / {large_peak / 1024:.0f} КБ")
+
+    # Проверяем отклик и постоянство памяти
+    assert large_total > small_total * 5
+    assert first_byte < 0.5, f"Первый байт слишком поздно: {first_byte:.3f} сек (лимит: 0.5 сек)"
+    assert large_peak < small_peak * 2, "Память выгрузки растет вместе с числом строк"